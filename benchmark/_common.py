@@ -0,0 +1,48 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The scripts run outside ComfyUI, so they put the ComfyUI root on sys.path (for
+`comfy.*`, `folder_paths`, ...) and import node modules from `nodes/` without
+executing the package __init__ (which registers routes on a live PromptServer).
+
+ComfyUI root defaults to two levels above this repo (custom_nodes/SATA_UtilityNode);
+override it with the COMFYUI_PATH environment variable.
+"""
+import importlib
+import os
+import sys
+import time
+import types
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODES_DIR = os.path.join(REPO_DIR, "nodes")
+COMFYUI_PATH = os.environ.get("COMFYUI_PATH", os.path.dirname(os.path.dirname(REPO_DIR)))
+
+_PACKAGE = "sata_utilitynode_nodes"
+
+
+def load_node_module(name):
+    """Import nodes/<name>.py as a submodule of a synthetic package (relative imports work)."""
+    if COMFYUI_PATH not in sys.path:
+        sys.path.insert(0, COMFYUI_PATH)
+    if _PACKAGE not in sys.modules:
+        pkg = types.ModuleType(_PACKAGE)
+        pkg.__path__ = [NODES_DIR]
+        sys.modules[_PACKAGE] = pkg
+    return importlib.import_module(f"{_PACKAGE}.{name}")
+
+
+def timeit(fn, repeats=5, warmup=1, sync=None):
+    """Return the best wall time (seconds) of `repeats` calls after `warmup` calls."""
+    for _ in range(warmup):
+        fn()
+        if sync:
+            sync()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        if sync:
+            sync()
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,51 @@
+"""
+One-off tile-size autotune for an upscale model.
+
+Runs the same autotune that Upscale_Machine performs with `autotune` enabled and
+writes the result to asset/upscale_profiles.json, so later ComfyUI runs start with
+the fastest tile size for this (architecture, device, dtype).
+
+    python benchmark/autotune_upscale.py 4x-UltraSharp.pth
+    python benchmark/autotune_upscale.py /path/to/model.safetensors --cpu --force
+"""
+import argparse
+import os
+
+import torch
+
+from _common import load_node_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="file in models/upscale_models or a path to a model file")
+    parser.add_argument("--cpu", action="store_true", help="tune the CPU execution mode")
+    parser.add_argument("--force", action="store_true", help="re-tune even if a profile entry exists")
+    args = parser.parse_args()
+
+    machine = load_node_module("upscale_machine")
+    autotune = load_node_module("upscale_autotune")
+    from comfy import model_management
+
+    node = machine.Upscale_Machine()
+    if os.path.isfile(args.model):
+        model = machine.MODEL_CACHE.get(args.model)
+    else:
+        model = node.load_model(args.model)
+
+    device = torch.device("cpu") if args.cpu else model_management.get_torch_device()
+    arch_name = type(model.model).__name__
+
+    if args.force:
+        for dtype in (torch.float32, torch.float16, torch.bfloat16):
+            autotune.clear_profile(arch_name, device, dtype)
+
+    # A small image is enough — tuning runs on synthetic tiles before inference
+    image = torch.rand(1, 3, 64, 64)
+    node.upscale_with_model(model, image, device, autotune=True)
+
+    print(f"Profiles written to {autotune.PROFILE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Spectral noise benchmark: previous per-call fft2 path vs nodes/noise_engine.py.
+
+The previous path is inlined below (fftfreq/meshgrid/mask rebuilt every call,
+complex fft2/ifft2 over the full spectrum). Both consume the same white noise,
+so outputs are compared directly.
+
+    python benchmark/bench_noise.py --size 2048 --batch 64 --channels 4 16
+"""
+import argparse
+
+import torch
+
+from _common import load_node_module, timeit
+
+
+def legacy_power_law(batch_size, c, h, w, alpha, device):
+    white = torch.randn((batch_size, c, h, w), device=device)
+    fft_noise = torch.fft.fft2(white)
+    y = torch.fft.fftfreq(h, device=device)
+    x = torch.fft.fftfreq(w, device=device)
+    dy, dx = torch.meshgrid(y, x, indexing="ij")
+    frequency_magnitude = torch.sqrt(dy ** 2 + dx ** 2)
+    if alpha > 0:
+        frequency_magnitude = frequency_magnitude + 1e-8
+    scale = frequency_magnitude ** (-alpha / 2.0)
+    scale[0, 0] = 0
+    return torch.fft.ifft2(fft_noise * scale).real
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2048, help="image edge length (latent is size/8)")
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--channels", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--alpha", type=float, nargs="+", default=[1.0, -1.5], help="1 = pink, -1.5 = blue")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = load_node_module("noise_engine")
+    device = torch.device(args.device)
+    sync = torch.cuda.synchronize if device.type == "cuda" else None
+    h = w = args.size // 8
+
+    print(f"device {device}, batch {args.batch}, latent {h}x{w}, threads {torch.get_num_threads()}")
+    print(f"{'channels':>9}{'alpha':>7}{'legacy (ms)':>13}{'engine (ms)':>13}{'speedup':>9}{'max |diff|':>12}")
+    for c in args.channels:
+        for alpha in args.alpha:
+            torch.manual_seed(0)
+            reference = legacy_power_law(args.batch, c, h, w, alpha, device)
+            torch.manual_seed(0)
+            result = engine.power_law_noise(args.batch, c, h, w, alpha, device)
+            diff = (result - reference).abs().max().item()
+            del reference, result
+
+            t_legacy = timeit(lambda: legacy_power_law(args.batch, c, h, w, alpha, device),
+                              repeats=args.repeats, sync=sync)
+            t_engine = timeit(lambda: engine.power_law_noise(args.batch, c, h, w, alpha, device),
+                              repeats=args.repeats, sync=sync)
+            print(f"{c:>9}{alpha:>7}{t_legacy * 1e3:>13.1f}{t_engine * 1e3:>13.1f}"
+                  f"{t_legacy / t_engine:>9.2f}{diff:>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
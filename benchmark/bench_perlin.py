@@ -0,0 +1,55 @@
+"""
+Perlin benchmark: previous multi-octave value-noise approximation vs the vectorized
+gradient-noise kernel in nodes/noise_engine.py.
+
+The previous approximation is inlined below (per octave: random tensor + full-size
+bicubic interpolate, plus a full-size white-noise pass).
+
+    python benchmark/bench_perlin.py --size 2048 --batch 64 --channels 16
+"""
+import argparse
+
+import torch
+import torch.nn.functional as F
+
+from _common import load_node_module, timeit
+
+
+def legacy_perlin_approx(batch_size, c, h, w, device):
+    noise = torch.zeros((batch_size, c, h, w), device=device)
+    for scale, weight in zip([2, 4, 8, 16], [0.5, 0.25, 0.125, 0.0625]):
+        sh, sw = max(1, h // scale), max(1, w // scale)
+        small_noise = torch.randn((batch_size, c, sh, sw), device=device)
+        noise += F.interpolate(small_noise, size=(h, w), mode="bicubic", align_corners=False) * weight
+    noise += torch.randn((batch_size, c, h, w), device=device) * 0.05
+    return noise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1024, help="image edge length (latent is size/8)")
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--octaves", type=int, nargs="+", default=[4, 6])
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = load_node_module("noise_engine")
+    device = torch.device(args.device)
+    sync = torch.cuda.synchronize if device.type == "cuda" else None
+    b, c, h, w = args.batch, args.channels, args.size // 8, args.size // 8
+
+    print(f"device {device}, batch {b}, channels {c}, latent {h}x{w}, threads {torch.get_num_threads()}")
+    t_legacy = timeit(lambda: legacy_perlin_approx(b, c, h, w, device), repeats=args.repeats, sync=sync)
+    print(f"{'legacy approximation (4 oct)':<32}{t_legacy * 1e3:>10.1f} ms")
+    for octaves in args.octaves:
+        for tileable in (False, True):
+            t = timeit(lambda: engine.perlin_noise(b, c, h, w, device, octaves=octaves, tileable=tileable),
+                       repeats=args.repeats, sync=sync)
+            label = f"gradient {octaves} oct{' tileable' if tileable else ''}"
+            print(f"{label:<32}{t * 1e3:>10.1f} ms{t_legacy / t:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Save_Machine compression presets: encode time vs file size per format.
+
+Encodes each image with every preset exactly as Save_Machine does (same PIL
+kwargs, no metadata) into memory. Without --images a synthetic 1024x1024
+"render" is used: smooth gradients and shapes plus mild sensor-like grain,
+which compresses much like typical diffusion outputs.
+
+    python benchmark/bench_save_presets.py
+    python benchmark/bench_save_presets.py --images output/*.png
+"""
+import argparse
+import glob
+import io
+
+import numpy as np
+from PIL import Image
+
+from _common import load_node_module, timeit
+
+
+def synthetic_render(size=1024, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    image = np.stack([0.6 * x + 0.2, 0.5 * y + 0.3 * np.sin(6 * x), 0.8 - 0.5 * x * y], axis=-1)
+    for _ in range(12):
+        cy, cx, r = rng.random(3) * [1, 1, 0.25]
+        mask = ((y - cy) ** 2 + (x - cx) ** 2) < r ** 2
+        image[mask] = image[mask] * 0.5 + rng.random(3).astype(np.float32) * 0.5
+    image += rng.normal(0, 0.015, image.shape).astype(np.float32)
+    return Image.fromarray((np.clip(image, 0, 1) * 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", nargs="*", default=None, help="image files or globs (default: synthetic)")
+    parser.add_argument("--size", type=int, default=1024, help="synthetic image edge length")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    save_machine = load_node_module("save_machine")
+
+    if args.images:
+        paths = [p for pattern in args.images for p in sorted(glob.glob(pattern))]
+        images = [Image.open(p).convert("RGB") for p in paths]
+    else:
+        images = [synthetic_render(args.size)]
+    megapixels = sum(im.width * im.height for im in images) / 1e6
+
+    print(f"{len(images)} image(s), {megapixels:.2f} MP total")
+    print("| format | preset   | encode (s) | MP/s  | size (KiB) | vs archival |")
+    print("|--------|----------|-----------:|------:|-----------:|------------:|")
+    for extension in ("png", "webp", "jpeg"):
+        archival_size = None
+        for preset in ("archival", "balanced", "fast"):
+            options = save_machine.encoder_options(extension, preset, 100, True)
+
+            def encode():
+                total = 0
+                for im in images:
+                    buffer = io.BytesIO()
+                    im.save(buffer, format=extension.upper(), **options)
+                    total += buffer.tell()
+                return total
+
+            size = encode()
+            archival_size = archival_size or size
+            t = timeit(encode, repeats=args.repeats, warmup=0)
+            print(f"| {extension:<6} | {preset:<8} | {t:>10.3f} | {megapixels / t:>5.1f} | "
+                  f"{size / 1024:>10.0f} | {size / archival_size:>10.2f}x |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+CPU benchmark: batched multi-tile engine vs comfy.utils.tiled_scale.
+
+Uses a randomly initialised SRVGGNetCompact-style network (the Real-ESRGAN
+Compact layout), so no model file is needed.
+
+    python benchmark/bench_tiling.py --size 512 --tile 128 --batch 8
+"""
+import argparse
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from _common import load_node_module, timeit
+
+
+class CompactSR(nn.Module):
+    """SRVGGNetCompact layout: conv body + PixelShuffle, nearest-upsampled skip."""
+
+    def __init__(self, feats=64, convs=16, scale=4):
+        super().__init__()
+        self.scale = scale
+        layers = [nn.Conv2d(3, feats, 3, padding=1), nn.PReLU(feats)]
+        for _ in range(convs):
+            layers += [nn.Conv2d(feats, feats, 3, padding=1), nn.PReLU(feats)]
+        layers += [nn.Conv2d(feats, 3 * scale * scale, 3, padding=1), nn.PixelShuffle(scale)]
+        self.body = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.body(x) + F.interpolate(x, scale_factor=self.scale, mode="nearest")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=512, help="input edge length (px)")
+    parser.add_argument("--tile", type=int, default=128)
+    parser.add_argument("--overlap", type=int, default=16)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8], help="tiles per forward pass")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tiling = load_node_module("upscale_tiling")
+    import comfy.utils
+
+    torch.manual_seed(0)
+    model = CompactSR().eval()
+    image = torch.rand(1, 3, args.size, args.size)
+
+    def current():
+        return comfy.utils.tiled_scale(image, model, tile_x=args.tile, tile_y=args.tile,
+                                       overlap=args.overlap, upscale_amount=model.scale)
+
+    reference = current()
+    baseline = timeit(current, repeats=args.repeats)
+    mpx = (args.size * model.scale) ** 2 / 1e6
+
+    print(f"input {args.size}x{args.size}, tile {args.tile}, overlap {args.overlap}, "
+          f"threads {torch.get_num_threads()}")
+    print(f"{'path':<28}{'time (s)':>10}{'out MP/s':>10}{'speedup':>9}{'max |diff|':>12}")
+    print(f"{'comfy.utils.tiled_scale':<28}{baseline:>10.3f}{mpx / baseline:>10.2f}{1.0:>9.2f}{0.0:>12.2e}")
+
+    for n in args.batch:
+        def batched():
+            return tiling.batched_tiled_scale(image, model, tile=args.tile, overlap=args.overlap,
+                                              scale=model.scale, tiles_per_batch=n)
+        diff = (batched() - reference).abs().max().item()
+        t = timeit(batched, repeats=args.repeats)
+        print(f"{f'batched_tiled_scale N={n}':<28}{t:>10.3f}{mpx / t:>10.2f}{baseline / t:>9.2f}{diff:>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
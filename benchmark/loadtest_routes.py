@@ -0,0 +1,156 @@
+"""
+Load test for the SATA REST routes against a running ComfyUI server.
+
+Concurrent clients hammer the routes while a probe measures how long PromptServer's
+event loop takes to answer a websocket ping on /ws (the same loop that delivers
+progress messages). A handler that blocks the loop on disk I/O or parsing shows up
+directly as probe latency.
+
+    python benchmark/loadtest_routes.py --url http://127.0.0.1:8188
+    python benchmark/loadtest_routes.py --concurrency 64 --duration 20 --touch
+
+--touch rewrites the mtimes of the asset/prompt files every --touch-interval seconds
+(server on this machine, same checkout), so every cache is invalidated and each burst
+re-reads and re-parses from disk — the cold path the routes used to run on the loop.
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+import time
+
+import aiohttp
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSET_DIR = os.path.join(REPO_DIR, "asset")
+PROMPT_DIR = os.path.join(REPO_DIR, "prompt")
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+    p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+    return (f"p50 {p(0.50):7.1f} ms  p95 {p(0.95):7.1f} ms  p99 {p(0.99):7.1f} ms  "
+            f"max {ordered[-1] * 1e3:7.1f} ms  (n={len(ordered)})")
+
+
+async def discover_requests(session, url):
+    """Request paths covering every route, using the files the server reports."""
+    async with session.get(f"{url}/sata/prompt_machine/csvs") as r:
+        csvs = (await r.json()).get("csvs", [])
+    async with session.get(f"{url}/sata/autocomplete/list") as r:
+        files = (await r.json()).get("files", [])
+
+    names = {}
+    for csv_file in csvs:
+        async with session.get(f"{url}/sata/prompt_machine/names", params={"csv": csv_file}) as r:
+            names[csv_file] = (await r.json()).get("names", [])
+
+    requests = [("resolutions_config", "/SATA_UtilityNode/resolutions_config", {}),
+                ("prompt_machine/csvs", "/sata/prompt_machine/csvs", {}),
+                ("autocomplete/list", "/sata/autocomplete/list", {}),
+                ("autocomplete/bundle", "/sata/autocomplete/bundle", {})]
+    for csv_file in csvs:
+        requests.append(("prompt_machine/names", "/sata/prompt_machine/names", {"csv": csv_file}))
+        for name in names[csv_file][:5]:
+            requests.append(("prompt_machine/get", "/sata/prompt_machine/get", {"csv": csv_file, "name": name}))
+    for file in files:
+        requests.append(("autocomplete/get", "/sata/autocomplete/get", {"file": file}))
+        for q in ("a", "mo", "gre", "xq"):
+            requests.append(("autocomplete/search", "/sata/autocomplete/search", {"file": file, "q": q}))
+    return requests
+
+
+async def probe(url, stop, samples, interval):
+    """Websocket ping -> pong round trips on /ws (answered by the server's event loop)."""
+    ws_url = url.replace("http", "ws", 1) + "/ws"
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(ws_url, autoping=False) as ws:
+            while not stop.is_set():
+                start = time.perf_counter()
+                await ws.ping()
+                while True:
+                    msg = await ws.receive()
+                    if msg.type == aiohttp.WSMsgType.PONG:
+                        break
+                    if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        return
+                samples.append(time.perf_counter() - start)
+                await asyncio.sleep(interval)
+
+
+async def worker(session, url, requests, stop, latencies, errors):
+    rng = random.Random()
+    while not stop.is_set():
+        label, path, params = rng.choice(requests)
+        start = time.perf_counter()
+        try:
+            async with session.get(url + path, params=params) as r:
+                await r.read()
+                if r.status >= 400:
+                    errors[label] = errors.get(label, 0) + 1
+        except aiohttp.ClientError:
+            errors[label] = errors.get(label, 0) + 1
+            continue
+        latencies.setdefault(label, []).append(time.perf_counter() - start)
+
+
+async def toucher(stop, interval):
+    paths = glob.glob(os.path.join(ASSET_DIR, "*")) + glob.glob(os.path.join(PROMPT_DIR, "*"))
+    while not stop.is_set():
+        now = time.time()
+        for path in paths:
+            os.utime(path, (now, now))
+        await asyncio.sleep(interval)
+
+
+async def run_phase(url, duration, concurrency, requests, probe_interval, touch_interval):
+    stop = asyncio.Event()
+    probe_samples, latencies, errors = [], {}, {}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = [asyncio.create_task(probe(url, stop, probe_samples, probe_interval))]
+        tasks += [asyncio.create_task(worker(session, url, requests, stop, latencies, errors))
+                  for _ in range(concurrency)]
+        if touch_interval:
+            tasks.append(asyncio.create_task(toucher(stop, touch_interval)))
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return probe_samples, latencies, errors
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8188", help="ComfyUI server base URL")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent route clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="seconds between probe pings")
+    parser.add_argument("--touch", action="store_true", help="keep invalidating caches (local server only)")
+    parser.add_argument("--touch-interval", type=float, default=0.5)
+    args = parser.parse_args()
+    url = args.url.rstrip("/")
+
+    async with aiohttp.ClientSession() as session:
+        requests = await discover_requests(session, url)
+    print(f"{url}: {len(requests)} distinct requests, concurrency {args.concurrency}, "
+          f"{args.duration:.0f} s per phase{', caches invalidated every %.1f s' % args.touch_interval if args.touch else ''}")
+
+    idle, _, _ = await run_phase(url, min(args.duration, 5.0), 0, requests, args.probe_interval, 0)
+    print(f"\nevent-loop probe, idle      : {percentiles(idle)}")
+
+    loaded, latencies, errors = await run_phase(url, args.duration, args.concurrency, requests,
+                                                args.probe_interval, args.touch_interval if args.touch else 0)
+    print(f"event-loop probe, under load: {percentiles(loaded)}")
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n{total / args.duration:.0f} requests/s")
+    for label in sorted(latencies):
+        print(f"  {label:<22}{percentiles(latencies[label])}"
+              f"{'  errors %d' % errors[label] if label in errors else ''}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
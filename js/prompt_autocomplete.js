@@ -1,4 +1,5 @@
 import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
 
 // Helper to get settings for both ComfyUI V1 and V2
 function getSettingValue(id, defaultValue) {
@@ -52,6 +53,14 @@ app.registerExtension({
             name: "Prompt Autocomplete Global Mode (All Text Widgets)",
             type: "boolean",
             defaultValue: false,
+        },
+        {
+            id: "SATA_UtilityNode.PromptAutocomplete.Source",
+            name: "Prompt Autocomplete Source (reload to apply)",
+            type: "combo",
+            options: ["server search", "local bundle"],
+            defaultValue: "server search",
+            tooltip: "server search: each keystroke queries the server index (fast page load, any library size). local bundle: download every file once (compressed, cached with ETag) and match in the browser (no request per keystroke).",
         }
     ],
 
@@ -65,9 +74,9 @@ app.registerExtension({
         const textWidgets = node.widgets?.filter(w => w.type === "customtext" || w.type === "text" || w.type === "STRING");
         if (!textWidgets) return;
 
-        // Load snippets (cache them)
-        if (!this.snippetsCache) {
-            await this.loadSnippets();
+        // Load the file list once; items are searched on the server
+        if (!this.files) {
+            await this.loadFiles();
         }
 
         textWidgets.forEach(w => {
@@ -75,6 +84,11 @@ app.registerExtension({
         });
     },
 
+    async setup() {
+        // Pushed by the server's asset watcher when files in prompt/ change
+        api.addEventListener("sata.assets_changed", ({ detail }) => this.onAssetsChanged(detail));
+    },
+
     async nodeCreated(node) {
         this.initAutocompleteForNode(node);
     },
@@ -83,29 +97,105 @@ app.registerExtension({
         this.initAutocompleteForNode(node);
     },
 
-    snippetsCache: null,
+    files: null,
+    bundle: null, // local bundle mode: { filename: items }
+    searchCache: new Map(), // "file\nquery" -> ranked items (recent searches, for backspacing)
+    searchSeq: 0,
+    SEARCH_LIMIT: 100,
+    SEARCH_CACHE_SIZE: 200,
 
-    async loadSnippets() {
+    async loadFiles() {
         try {
-            // 1. List files
+            if (getSettingValue("SATA_UtilityNode.PromptAutocomplete.Source", "server search") === "local bundle") {
+                // One compressed response; the browser revalidates it with If-None-Match (304 when unchanged)
+                const bundleResp = await fetch("/sata/autocomplete/bundle");
+                const bundleData = await bundleResp.json();
+                this.bundle = bundleData.files || {};
+                this.files = Object.keys(this.bundle).sort();
+                return;
+            }
             const listResp = await fetch("/sata/autocomplete/list");
             const listData = await listResp.json();
-            const files = listData.files || [];
+            this.files = listData.files || [];
+        } catch (err) {
+            console.error("[PromptAutocomplete] Failed to load file list:", err);
+        }
+    },
 
-            this.snippetsCache = {};
+    async searchItems(file, query) {
+        // The server keeps an index per file and returns only the top-ranked hits
+        if (this.bundle) return this.searchBundle(file, query);
 
-            // 2. Load content for each file
-            for (const file of files) {
-                const contentResp = await fetch(`/sata/autocomplete/get?file=${encodeURIComponent(file)}`);
-                const contentData = await contentResp.json();
-                this.snippetsCache[file] = contentData.items || [];
-            }
+        const key = file + "\n" + query;
+        if (this.searchCache.has(key)) return this.searchCache.get(key);
+
+        const params = new URLSearchParams({ file, q: query, limit: String(this.SEARCH_LIMIT) });
+        const resp = await fetch(`/sata/autocomplete/search?${params}`);
+        const data = await resp.json();
+        const items = data.items || [];
+
+        this.searchCache.set(key, items);
+        if (this.searchCache.size > this.SEARCH_CACHE_SIZE) {
+            this.searchCache.delete(this.searchCache.keys().next().value);
+        }
+        return items;
+    },
+
+    async onAssetsChanged(detail) {
+        if (!detail || detail.directory !== "prompt" || !this.files) return;
+        const isPromptFile = f => /\.(csv|json)$/.test(f);
+        const changed = (detail.changed || []).filter(isPromptFile);
+        const removed = (detail.removed || []).filter(isPromptFile);
+        if (!changed.length && !removed.length) return;
+
+        // Forget cached results of the touched files only
+        const touched = new Set([...changed, ...removed]);
+        for (const key of [...this.searchCache.keys()]) {
+            if (touched.has(key.split("\n")[0])) this.searchCache.delete(key);
+        }
 
+        try {
+            if (this.bundle) {
+                // Local mode: refetch just the changed files
+                removed.forEach(f => delete this.bundle[f]);
+                for (const file of changed) {
+                    const resp = await fetch(`/sata/autocomplete/get?file=${encodeURIComponent(file)}`);
+                    const data = await resp.json();
+                    this.bundle[file] = data.items || [];
+                }
+                this.files = Object.keys(this.bundle).sort();
+            } else if (removed.length || changed.some(f => !this.files.includes(f))) {
+                // Server mode: only the file list is held here
+                await this.loadFiles();
+            }
         } catch (err) {
-            console.error("[PromptAutocomplete] Failed to load snippets:", err);
+            console.error("[PromptAutocomplete] Failed to refresh changed files:", err);
         }
     },
 
+    searchBundle(file, query) {
+        const items = this.bundle[file] || [];
+        const matches = [];
+        items.forEach(i => {
+            const res = fuzzyMatch(i, query);
+            if (res.match) {
+                matches.push({ value: i, score: res.score });
+            }
+        });
+        matches.sort((a, b) => a.score - b.score);
+        return matches.map(m => m.value).slice(0, this.SEARCH_LIMIT);
+    },
+
+    async randomItem(file) {
+        if (this.bundle) {
+            const items = this.bundle[file] || [];
+            return items.length > 0 ? items[Math.floor(Math.random() * items.length)] : "";
+        }
+        const resp = await fetch(`/sata/autocomplete/random?file=${encodeURIComponent(file)}`);
+        const data = await resp.json();
+        return data.item || "";
+    },
+
     attachAutocomplete(widget) {
         // We need to hook into the DOM element of the widget
         // ComfyUI widgets usually expose their input element via `inputEl` or we might need to find it.
@@ -232,10 +322,11 @@ app.registerExtension({
                     const itemQuery = parts.slice(1).join(":"); // rest is item query
 
                     // Check if catName is valid
-                    if (this.snippetsCache[catName + ".csv"] || this.snippetsCache[catName + ".json"] || this.snippetsCache[catName]) {
+                    const files = this.files || [];
+                    if (files.includes(catName + ".csv") || files.includes(catName + ".json") || files.includes(catName)) {
                         // It's a valid category (roughly). 
                         // Let's find the exact filename key
-                        let key = Object.keys(this.snippetsCache).find(k => k.startsWith(catName));
+                        let key = files.find(k => k.startsWith(catName));
                         if (key) {
                             this.currentCategory = key;
                             this.updateItems(itemQuery);
@@ -255,7 +346,7 @@ app.registerExtension({
                 if (parts.length > 1) {
                     // Maybe user typed "style:" manually?
                     const catName = parts[0];
-                    let key = Object.keys(this.snippetsCache).find(k => k.replace(/\.(csv|json)$/, "") === catName);
+                    let key = (this.files || []).find(k => k.replace(/\.(csv|json)$/, "") === catName);
                     if (key) {
                         this.currentCategory = key;
                         this.updateItems(parts.slice(1).join(":"));
@@ -332,7 +423,7 @@ app.registerExtension({
     },
 
     updateCategories(query) {
-        const files = Object.keys(this.snippetsCache || {});
+        const files = this.files || [];
         const matches = [];
         files.forEach(f => {
             const display = f.replace(/\.(csv|json)$/, "");
@@ -353,19 +444,19 @@ app.registerExtension({
         this.renderPopup();
     },
 
-    updateItems(query) {
+    async updateItems(query) {
         if (!this.currentCategory) return;
-        const items = this.snippetsCache[this.currentCategory] || [];
+        const category = this.currentCategory;
+        const seq = ++this.searchSeq;
 
-        const matches = [];
-        items.forEach(i => {
-            const res = fuzzyMatch(i, query);
-            if (res.match) {
-                matches.push({ value: i, score: res.score });
-            }
-        });
-        matches.sort((a, b) => a.score - b.score);
-        const sortedItems = matches.map(m => m.value).slice(0, 100);
+        let sortedItems = [];
+        try {
+            sortedItems = await this.searchItems(category, query);
+        } catch (err) {
+            console.error("[PromptAutocomplete] Search failed:", err);
+        }
+        // A newer keystroke (or closing the popup) supersedes this response
+        if (seq !== this.searchSeq || !this.active || this.currentCategory !== category) return;
 
         // Add "Random" option at top
         this.filteredItems = [
@@ -458,11 +549,21 @@ app.registerExtension({
         }
     },
 
-    selectItem(input) {
+    async selectItem(input) {
         if (!input) return;
         const item = this.filteredItems[this.selectedIndex];
         if (!item) return;
 
+        // Random picks come from the server (the browser only holds search results)
+        let randomText = "";
+        if (item.type === "random") {
+            try {
+                randomText = await this.randomItem(this.currentCategory);
+            } catch (err) {
+                console.error("[PromptAutocomplete] Random pick failed:", err);
+            }
+        }
+
         const val = input.value;
         const cursor = input.selectionStart;
         const trigger = this.triggerChar;
@@ -492,11 +593,8 @@ app.registerExtension({
             return;
 
         } else if (item.type === "random") {
-            // Pick random item from current category
-            const items = this.snippetsCache[this.currentCategory] || [];
-            if (items.length > 0) {
-                textToInsert = items[Math.floor(Math.random() * items.length)];
-            }
+            // Random item from the current category
+            textToInsert = randomText;
         } else {
             // Normal item
             textToInsert = item.value;
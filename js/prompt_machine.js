@@ -1,5 +1,6 @@
 // prompt_machine_frontend.js
 import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
 
 app.registerExtension({
     name: "SATA_UtilityNode.PromptMachineFrontend",
@@ -117,6 +118,33 @@ app.registerExtension({
             updatePreviews(value);
         };
 
+        // Server-side CSV edits (pushed by the asset watcher): reload only what this node shows
+        async function onAssetsChanged({ detail }) {
+            if (!detail || detail.directory !== "asset") return;
+            const changed = (detail.changed || []).filter(f => f.endsWith(".csv"));
+            const removed = (detail.removed || []).filter(f => f.endsWith(".csv"));
+            if (!changed.length && !removed.length) return;
+            try {
+                // A CSV was added or removed: refresh the file dropdown
+                if (removed.length || changed.some(f => !csvWidget.options.values.includes(f))) {
+                    const resp = await fetch("/sata/prompt_machine/csvs");
+                    const data = await resp.json();
+                    if (data.csvs && data.csvs.length) csvWidget.options.values = data.csvs;
+                }
+                if (changed.includes(csvWidget.value) || removed.includes(csvWidget.value)) {
+                    await loadNames(csvWidget.value);
+                }
+            } catch (err) {
+                console.error("[PromptMachineFrontend] Failed to refresh changed CSVs:", err);
+            }
+        }
+        api.addEventListener("sata.assets_changed", onAssetsChanged);
+        const onRemoved = node.onRemoved;
+        node.onRemoved = function () {
+            api.removeEventListener("sata.assets_changed", onAssetsChanged);
+            return onRemoved?.apply(this, arguments);
+        };
+
         // Initial sync
         loadNames(csvWidget.value).then(() => {
             updatePreviews(nameWidget.value);
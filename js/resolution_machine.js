@@ -1,4 +1,5 @@
 import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
 
 app.registerExtension({
     name: "SATA_UtilityNode.Resolution_Machine",
@@ -159,6 +160,23 @@ app.registerExtension({
             app.graph.change();
         });
 
+        // --- Reload when resolutions.json changes on the server (pushed by the asset watcher) ---
+        async function onAssetsChanged({ detail }) {
+            if (!detail || detail.directory !== "asset") return;
+            if (!(detail.changed || []).includes("resolutions.json")) return;
+            await loadConfig();
+            if (resolutionsConfig.models) {
+                modelWidget.options.values = Object.keys(resolutionsConfig.models);
+            }
+            refreshResolutions();
+        }
+        api.addEventListener("sata.assets_changed", onAssetsChanged);
+        const onRemoved = node.onRemoved;
+        node.onRemoved = function () {
+            api.removeEventListener("sata.assets_changed", onAssetsChanged);
+            return onRemoved?.apply(this, arguments);
+        };
+
         // --- Initial sync ---
         refreshResolutions();
     }
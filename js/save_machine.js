@@ -0,0 +1,21 @@
+import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
+
+// Background writes (Save_Machine async_write) that failed after the node returned
+app.registerExtension({
+    name: "SATA_UtilityNode.Save_Machine",
+
+    async setup() {
+        api.addEventListener("sata.save_failed", ({ detail }) => {
+            if (!detail) return;
+            const node = detail.node != null ? app.graph?.getNodeById(Number(detail.node)) : null;
+            const summary = `Save_Machine${node ? ` #${node.id}` : ""}: write failed`;
+            const message = `${detail.file}: ${detail.error}`;
+            console.error(`[Save_Machine] ${summary} — ${message}`);
+            const toast = app.extensionManager?.toast;
+            if (toast) {
+                toast.add({ severity: "error", summary, detail: message, life: 10000 });
+            }
+        });
+    },
+});
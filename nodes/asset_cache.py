@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .asset_watcher import ASSET_WATCHER
+
+# Root asset folder of SATA_UtilityNode
+ASSET_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "asset")
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file — changes whenever the file is rewritten."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Async access for the REST routes
+#
+# Handlers run on PromptServer's event loop, which also carries the websocket
+# progress messages; disk reads and parsing go to a small thread pool instead.
+# Concurrent requests for the same key share one run, and values checked within
+# FILE_RECHECK_SECONDS are served straight from memory. Parsing is CPU-bound
+# Python, so the pool stays small: more threads only compete with the event loop
+# for the GIL.
+# ─────────────────────────────────────────────────────────────────────────────
+ASSET_IO_WORKERS = 2
+FILE_RECHECK_SECONDS = 1.0
+
+_executors = {}
+_executors_lock = threading.Lock()
+_inflight = {}      # key -> asyncio future; touched only on the event loop thread
+
+
+def io_executor(light=False):
+    """Thread pool for parsing (ASSET_IO_WORKERS) or, with light, a 1-thread lane for stats and
+    directory listings, so those never queue behind a long parse."""
+    with _executors_lock:
+        executor = _executors.get(light)
+        if executor is None:
+            executor = _executors[light] = ThreadPoolExecutor(
+                max_workers=1 if light else ASSET_IO_WORKERS,
+                thread_name_prefix="sata_asset_stat" if light else "sata_asset_io")
+        return executor
+
+
+async def run_io(key, fn, *args, light=False):
+    """Await fn(*args) on the I/O pool; callers passing the same key while it runs share the result."""
+    loop = asyncio.get_running_loop()
+    future = _inflight.get(key)
+    if future is None or future.get_loop() is not loop:
+        future = loop.run_in_executor(io_executor(light), fn, *args)
+        _inflight[key] = future
+
+        def done(f):
+            if _inflight.get(key) is f:
+                del _inflight[key]
+
+        future.add_done_callback(done)
+    # shield: one cancelled request must not cancel the load the others wait on
+    return await asyncio.shield(future)
+
+
+class FileCache:
+    """
+    Parsed view of one file, rebuilt only when the file's mtime/size change.
+    `parse(path)` runs on first access and after every modification; each get()
+    costs one os.stat — none while the asset watcher reports changes for the
+    folder (it invalidates the cache instead). aget() is the event-loop variant:
+    warm values are returned without touching the disk, everything else runs on
+    the I/O pool.
+    """
+
+    def __init__(self, path, parse):
+        self.path = path
+        self.parse = parse
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self._signature = None
+        self._value = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        ASSET_WATCHER.subscribe_file(path, self.invalidate)
+
+    def _watched(self):
+        return self._signature is not None and ASSET_WATCHER.is_watching(self.directory)
+
+    def get(self):
+        if self._watched():
+            with self._lock:
+                if self._signature is not None:
+                    return self._value
+        try:
+            signature = file_signature(self.path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"{os.path.basename(self.path)} not found at {self.path}") from None
+        with self._lock:
+            if signature != self._signature:
+                self._value = self.parse(self.path)
+                self._signature = signature
+            self._checked = time.monotonic()
+            return self._value
+
+    def peek(self):
+        """The cached value if it was validated within FILE_RECHECK_SECONDS, else None."""
+        if self._watched() or (self._signature is not None and time.monotonic() - self._checked < FILE_RECHECK_SECONDS):
+            return self._value
+        return None
+
+    async def aget(self):
+        value = self.peek()
+        if value is not None:
+            return value
+        value, signature = self._value, self._signature
+        if signature is not None:
+            # Revalidate with a stat on the light lane; parse only if the file changed
+            try:
+                current = await run_io(("stat", self.path), file_signature, self.path, light=True)
+            except FileNotFoundError:
+                current = None
+            if current == signature and self._signature == signature:
+                self._checked = time.monotonic()
+                return value
+        return await run_io(self, self.get)
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+            self._value = None
+
+    def close(self):
+        """Stop watching the file and drop the value (for caches that are discarded)."""
+        ASSET_WATCHER.unsubscribe_file(self.path, self.invalidate)
+        self.invalidate()
+
+
+def json_body(data):
+    """Serialize once for REST responses: (body bytes, strong ETag)."""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    return etag in (tag.strip() for tag in header.split(",")) or header.strip() == "*"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# resolutions.json — shared by Latent_Machine, Resolution_Machine and the
+# /SATA_UtilityNode/resolutions_config route.
+# ─────────────────────────────────────────────────────────────────────────────
+RESOLUTIONS_PATH = os.path.join(ASSET_DIR, "resolutions.json")
+
+
+class ResolutionConfig:
+    """
+    Indexed resolutions.json:
+      config           : the raw dict (treat as read-only)
+      models           : model names in file order
+      resolutions_list : sorted resolution labels + "Custom" (for INPUT_TYPES validation)
+      lookup           : (model, dimension, resolution) -> (width, height), first bucket wins
+      body, etag       : pre-serialized REST payload
+    """
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            self.config = json.load(f)
+
+        models = self.config.get("models", {})
+        buckets = self.config.get("resolutions", {})
+        self.models = list(models.keys())
+
+        all_resolutions = {"Custom"}
+        for bucket in buckets.values():
+            for dim in bucket.values():
+                all_resolutions.update(dim.keys())
+        self.resolutions_list = sorted(all_resolutions)
+
+        self.lookup = {}
+        for model, model_buckets in models.items():
+            for bucket in model_buckets:
+                for dimension, entries in buckets.get(bucket, {}).items():
+                    for resolution, data in entries.items():
+                        self.lookup.setdefault((model, dimension, resolution), (data["width"], data["height"]))
+
+        self.body, self.etag = json_body(self.config)
+
+
+RESOLUTIONS = FileCache(RESOLUTIONS_PATH, ResolutionConfig)
+
+
+def resolution_config(node_name):
+    """Parsed + indexed resolutions.json (re-read only when the file changes)."""
+    try:
+        return RESOLUTIONS.get()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"[{node_name}] resolutions.json not found at {RESOLUTIONS_PATH}") from None
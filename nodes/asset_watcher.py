@@ -0,0 +1,276 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+NODE_NAME = "AssetWatcher"
+
+# Set SATA_ASSET_WATCHER=0 to disable (caches then fall back to one stat per access)
+WATCHER_ENABLED = os.environ.get("SATA_ASSET_WATCHER", "1") != "0"
+WATCH_DEBOUNCE_SECONDS = 0.2    # editors write in bursts; one notification per burst
+WATCH_POLL_SECONDS = 2.0        # stat-polling interval when inotify is unavailable
+EVENT_NAME = "sata.assets_changed"
+
+# inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _ignored_name(name):
+    """Editor swap files, our own temp files, hidden files."""
+    return name.startswith(".") or name.endswith(("~", ".tmp", ".swp", ".swx"))
+
+
+def _directory_key(path):
+    return os.path.normcase(os.path.realpath(path))
+
+
+class _Inotify:
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        return wd
+
+    def read(self, timeout):
+        """[(wd, mask, name)] — empty after `timeout` seconds without events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+
+class AssetWatcher:
+    """
+    Watches asset folders and reports file changes, debounced, to subscribers:
+      - subscribe(directory, fn)      fn(changed_names, removed_names) for any file in it
+      - subscribe_file(path, fn)      fn() when that one file changes or disappears
+                                      (unsubscribe_file(path, fn) to stop)
+    Every burst is also pushed to the browser as EVENT_NAME
+    ({"directory": <folder name>, "changed": [...], "removed": [...]}).
+
+    Linux uses inotify (via ctypes); elsewhere, or if inotify fails, the folders are
+    stat-polled every WATCH_POLL_SECONDS. is_watching() is True only for inotify
+    watches, whose notifications are immediate enough for caches to skip their own
+    stat checks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs = {}             # key -> {"path", "subscribers", "files", "wd", "snapshot"}
+        self._wds = {}              # inotify wd -> key
+        self._keys = {}             # directory as passed in -> key (realpath is a few syscalls)
+        self._inotify = None
+        self._thread = None
+        self._last_poll = 0.0
+
+    # ── subscriptions ────────────────────────────────────────────────────────
+    def _entry(self, directory):
+        key = _directory_key(directory)
+        entry = self._dirs.get(key)
+        if entry is None:
+            entry = self._dirs[key] = {"path": directory, "subscribers": [], "files": {},
+                                       "wd": None, "snapshot": self._snapshot(directory)}
+            self._add_watch(key, entry)
+        return entry
+
+    def subscribe(self, directory, callback):
+        """Call fn(changed_names, removed_names) after files in `directory` change."""
+        if not WATCHER_ENABLED:
+            return
+        with self._lock:
+            self._entry(directory)["subscribers"].append(callback)
+        self._start()
+
+    def subscribe_file(self, path, callback):
+        """Call fn() after the file at `path` changes or is removed."""
+        if not WATCHER_ENABLED:
+            return
+        directory, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            self._entry(directory)["files"].setdefault(os.path.normcase(name), []).append(callback)
+        self._start()
+
+    def unsubscribe_file(self, path, callback):
+        """Remove a subscribe_file() callback (the folder itself stays watched)."""
+        directory, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            entry = self._dirs.get(_directory_key(directory))
+            callbacks = entry["files"].get(os.path.normcase(name)) if entry else None
+            if callbacks and callback in callbacks:
+                callbacks.remove(callback)
+                if not callbacks:
+                    del entry["files"][os.path.normcase(name)]
+
+    def is_watching(self, directory):
+        """True if changes in `directory` are reported as they happen (inotify)."""
+        key = self._keys.get(directory)
+        if key is None:
+            key = self._keys[directory] = _directory_key(directory)
+        entry = self._dirs.get(key)
+        return entry is not None and entry["wd"] is not None and self._thread is not None
+
+    # ── backend ──────────────────────────────────────────────────────────────
+    def _add_watch(self, key, entry):
+        if self._inotify is None and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except Exception as e:
+                print(f"[{NODE_NAME}] inotify unavailable ({e}), polling every {WATCH_POLL_SECONDS}s")
+                self._inotify = False
+        if self._inotify:
+            try:
+                entry["wd"] = self._inotify.add(entry["path"])
+                self._wds[entry["wd"]] = key
+            except OSError as e:
+                print(f"[{NODE_NAME}] Cannot watch {entry['path']} ({e}), polling it instead")
+
+    @staticmethod
+    def _snapshot(directory):
+        snapshot = {}
+        try:
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    if not _ignored_name(item.name) and item.is_file():
+                        st = item.stat()
+                        snapshot[item.name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return snapshot
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="sata_asset_watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self._inotify:
+                    self._read_inotify()
+                else:
+                    time.sleep(WATCH_POLL_SECONDS)
+                # Directories without an inotify watch are polled
+                self._poll(WATCH_POLL_SECONDS if self._inotify else 0.0)
+            except Exception as e:
+                print(f"[{NODE_NAME}] Watcher error: {e}")
+                time.sleep(WATCH_POLL_SECONDS)
+
+    def _read_inotify(self):
+        events = self._inotify.read(WATCH_POLL_SECONDS)
+        if not events:
+            return
+        # Debounce: keep collecting until the folder has been quiet for a moment
+        while True:
+            more = self._inotify.read(WATCH_DEBOUNCE_SECONDS)
+            if not more:
+                break
+            events.extend(more)
+
+        touched = {}                # key -> set of names (None = everything)
+        with self._lock:
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    for key in self._dirs:
+                        touched[key] = None
+                    continue
+                key = self._wds.get(wd)
+                if key is None:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    # Folder itself gone: fall back to polling it
+                    self._wds.pop(wd, None)
+                    self._dirs[key]["wd"] = None
+                    touched[key] = None
+                    continue
+                if name and not _ignored_name(name) and touched.get(key, ()) is not None:
+                    touched.setdefault(key, set()).add(name)
+        for key, names in touched.items():
+            self._dispatch(key, names)
+
+    def _poll(self, min_interval):
+        now = time.monotonic()
+        if now - self._last_poll < min_interval:
+            return
+        self._last_poll = now
+        with self._lock:
+            polled = [key for key, entry in self._dirs.items() if entry["wd"] is None]
+        for key in polled:
+            self._dispatch(key, None)
+
+    def _dispatch(self, key, names):
+        """Work out what changed (names=None: diff the whole folder) and notify."""
+        with self._lock:
+            entry = self._dirs[key]
+            before = entry["snapshot"]
+            after = self._snapshot(entry["path"])
+            entry["snapshot"] = after
+            subscribers = list(entry["subscribers"])
+            file_callbacks = dict(entry["files"])
+        if names is None:
+            names = {n for n in set(before) | set(after) if before.get(n) != after.get(n)}
+        changed = sorted(n for n in names if n in after)
+        removed = sorted(n for n in names if n not in after)
+        if not changed and not removed:
+            return
+
+        for name in changed + removed:
+            for callback in file_callbacks.get(os.path.normcase(name), ()):
+                self._call(callback)
+        for callback in subscribers:
+            self._call(callback, changed, removed)
+        self._notify(os.path.basename(os.path.normpath(entry["path"])), changed, removed)
+
+    @staticmethod
+    def _call(callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"[{NODE_NAME}] Change callback failed: {e}")
+
+    @staticmethod
+    def _notify(directory, changed, removed):
+        print(f"[{NODE_NAME}] {directory}: changed {changed}, removed {removed}")
+        try:
+            from server import PromptServer
+            PromptServer.instance.send_sync(EVENT_NAME, {"directory": directory, "changed": changed, "removed": removed})
+        except Exception:
+            pass        # no server (scripts, benchmarks) or no clients yet
+
+
+ASSET_WATCHER = AssetWatcher()
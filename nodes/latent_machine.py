@@ -1,50 +1,39 @@
-import json
-import os
 import torch
 import torch.fft
-import random
 import comfy.model_management
+from .noise_engine import (power_law_noise, blue_noise, perlin_noise, white_noise, make_generator,
+                           sample_generators)
+from .asset_cache import resolution_config
 
 NODE_NAME = "Latent_Machine"
 
-# Path to JSON config (root of SATA_UtilityNode folder)
-CONFIG_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), "asset", "resolutions.json"
-)
-
-def load_config():
-    if not os.path.exists(CONFIG_PATH):
-        raise FileNotFoundError(f"[{NODE_NAME}] resolutions.json not found at {CONFIG_PATH}")
-    with open(CONFIG_PATH, "r", encoding="utf-8-sig") as f:
-        return json.load(f)
+LATENT_DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
 
 
 class Latent_Machine:
     """
-    Creates an empty latent initialized with Power-Law (1/f) noise, Perlin-like noise, or Plasma noise.
+    Creates an empty latent initialized with Power-Law (1/f) noise, gradient (Perlin) fractal noise, or Plasma noise.
     Supports 4-channel (SD1.5/SDXL) and 16-channel (Flux/SD3) latents.
     Supports recommended model resolutions out of the box.
     """
     
     def __init__(self):
-        pass
+        self.generator = None
 
     @classmethod
     def INPUT_TYPES(cls):
-        config = load_config()
+        config = resolution_config(NODE_NAME)
 
         # all models
-        models = list(config["models"].keys())
+        models = list(config.models)
         default_model = models[0] if models else "Unknown"
 
-        # Collect ALL possible resolutions to pass validation
-        all_resolutions = set(["Custom"])
-        if "resolutions" in config:
-            for bucket in config["resolutions"].values():
-                for dim in bucket.values():
-                    all_resolutions.update(dim.keys())
-        
-        resolutions_list = sorted(list(all_resolutions))
+        # ALL possible resolutions, so any bucket's selection passes validation
+        resolutions_list = list(config.resolutions_list)
 
         return {
             "required": {
@@ -65,7 +54,25 @@ class Latent_Machine:
                 "intensity": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 10.0, "step": 0.1}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
                 "high_contrast": ("BOOLEAN", {"default": False}),
-            }
+            },
+            "optional": {
+                "seed_mode": (["batch", "per_sample"], {"default": "batch",
+                                                        "tooltip": "per_sample: sample k uses seed + k, so any sample can be regenerated on its own"}),
+                "batch_index": ("INT", {"default": 0, "min": 0, "max": 4095,
+                                        "tooltip": "per_sample only: index of the first generated sample (batch_index .. batch_index + batch_size - 1)"}),
+                "dtype": (["float32", "float16", "bfloat16"], {"default": "float32",
+                                                               "tooltip": "Latent dtype. FFT noise is shaped in float32 and cast once"}),
+                "preview": (["on", "off"], {"default": "on",
+                                            "tooltip": "off: skip building the IMAGE preview and output a black image of the same size"}),
+                "octaves": ("INT", {"default": 4, "min": 1, "max": 8,
+                                    "tooltip": "Perlin only: number of fractal octaves"}),
+                "lacunarity": ("FLOAT", {"default": 2.0, "min": 1.0, "max": 4.0, "step": 0.1,
+                                         "tooltip": "Perlin only: frequency multiplier per octave"}),
+                "persistence": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.05,
+                                          "tooltip": "Perlin only: amplitude multiplier per octave"}),
+                "tileable": ("BOOLEAN", {"default": False,
+                                         "tooltip": "Perlin only: wrap the lattice so the noise tiles seamlessly (panoramas)"}),
+            },
         }
 
     RETURN_TYPES = ("LATENT", "IMAGE")
@@ -74,33 +81,19 @@ class Latent_Machine:
     CATEGORY = "SATA_UtilityNode"
 
     def get_resolution_dimensions(self, model, dimension, resolution, width, height):
-        try:
-            config = load_config()
-        except Exception:
-            return (width, height)
-
-        if model not in config.get("models", {}):
-            return (width, height)
-
         if resolution == "Custom":
             return (width, height)
 
-        buckets = config["models"][model]
-        
-        resolution_data = None
-        for bucket in buckets:
-            if bucket in config.get("resolutions", {}):
-                 if dimension in config["resolutions"][bucket]:
-                      if resolution in config["resolutions"][bucket][dimension]:
-                          resolution_data = config["resolutions"][bucket][dimension][resolution]
-                          break
-        
-        if not resolution_data:
-             return (width, height)
+        try:
+            config = resolution_config(NODE_NAME)
+        except Exception:
+            return (width, height)
 
-        return (resolution_data["width"], resolution_data["height"])
+        # First bucket of the model that has this dimension/resolution (precomputed)
+        return config.lookup.get((model, dimension, resolution), (width, height))
 
-    def generate_noise(self, model="SD 1.5", dimension="Square", resolution="Custom", width=512, height=512, batch_size=1, noise_type="Gaussian (White): Sharp Architecture, Text, intricate mechanics", intensity=1.0, seed=0, high_contrast=False):
+    def generate_noise(self, model="SD 1.5", dimension="Square", resolution="Custom", width=512, height=512, batch_size=1, noise_type="Gaussian (White): Sharp Architecture, Text, intricate mechanics", intensity=1.0, seed=0, high_contrast=False, seed_mode="batch", batch_index=0, dtype="float32", preview="on",
+                       octaves=4, lacunarity=2.0, persistence=0.5, tileable=False):
         # Check if this is an old node layout (shifted arguments due to ComfyUI's positional widget serialization)
         if isinstance(model, int):
             actual_width = model
@@ -121,10 +114,15 @@ class Latent_Machine:
             actual_high_contrast = high_contrast
 
         self.device = comfy.model_management.get_torch_device()
-        # Set seed for reproducibility
-        torch.manual_seed(actual_seed)
-        random.seed(actual_seed)
-        
+        # Dedicated generators for reproducibility (global torch / random state untouched).
+        # batch     : one stream for the whole batch (same noise as seeding the global RNG)
+        # per_sample: sample k draws from its own stream seeded seed + k
+        per_sample = seed_mode == "per_sample"
+        if per_sample:
+            self.generator = sample_generators(actual_seed, self.device, actual_batch_size, start=batch_index)
+        else:
+            self.generator = make_generator(actual_seed, self.device)
+
         # Determine channels based on model
         model_lower = actual_model.lower()
         if any(k in model_lower for k in ["flux", "qwen", "sd3", "lumina", "wan", "auraflow", "z-image", "mochi", "ltx", "hunyuanvideo"]):
@@ -136,13 +134,16 @@ class Latent_Machine:
         h = actual_height // 8
         w = actual_width // 8
         
+        latent_dtype = LATENT_DTYPES.get(dtype, torch.float32)
+
         # Generate base noise
         if "Gaussian" in actual_noise_type:
-            noise = torch.randn((actual_batch_size, c, h, w), device=self.device)
+            # Drawn directly at the latent dtype — no float32 intermediate
+            noise = white_noise((actual_batch_size, c, h, w), self.device, self.generator, dtype=latent_dtype)
             
         elif "Perlin" in actual_noise_type:
-            # Multi-Octave Value Noise Approximation
-            noise = self.generate_perlin_approx(actual_batch_size, c, h, w)
+            # Multi-Octave Gradient Noise (fractal Perlin)
+            noise = self.generate_perlin_noise(actual_batch_size, c, h, w, octaves, lacunarity, persistence, tileable)
             
         elif "Blue" in actual_noise_type:
             # FFT-based Blue Noise (High-Frequency)
@@ -161,34 +162,52 @@ class Latent_Machine:
                 
             noise = self.generate_power_law_noise(actual_batch_size, c, h, w, alpha)
 
+        # Single cast (frees the float32 working tensor before the in-place passes)
+        noise = noise.to(latent_dtype)
+
         # Normalize standard deviation to match expected latent variance (approx 1.0 for standard Gaussian)
         # This ensures intensity works consistently across different noise types
-        current_std = noise.std()
-        if current_std > 1e-6:
-            noise = noise / current_std
+        # (per sample in per_sample mode, so a sample never depends on its batch-mates)
+        if per_sample:
+            current_std = noise.std(dim=(1, 2, 3), keepdim=True)
+            noise.div_(torch.where(current_std > 1e-6, current_std, torch.ones_like(current_std)))
+        else:
+            current_std = noise.std()
+            if current_std > 1e-6:
+                noise.div_(current_std)
             
         # Apply offset noise for high contrast
         if actual_high_contrast:
-            noise = noise + 0.1
+            noise.add_(0.1)
             
         # Apply intensity
-        noise = noise * actual_intensity
+        noise.mul_(actual_intensity)
+
+        if preview == "off":
+            # Black image with the preview's shape, so downstream batch/size assumptions still hold
+            return ({"samples": noise}, torch.zeros((actual_batch_size, h, w, 3)))
 
         # Prepare Image output for visualization/masking
-        # Slice the first 3 channels and normalize to [0, 1]
-        img_tensor = noise[:, :3, :, :]
+        # Slice the first 3 channels (float32 copy) and normalize to [0, 1] in place
+        img_tensor = noise[:, :3, :, :].to(torch.float32, copy=True)
         if img_tensor.shape[1] < 3:
             # If for some weird reason it's less than 3 channels, pad it
             padding = torch.zeros((actual_batch_size, 3 - img_tensor.shape[1], h, w), device=self.device)
             img_tensor = torch.cat([img_tensor, padding], dim=1)
         
         # Normalize min-max
-        img_min = img_tensor.min()
-        img_max = img_tensor.max()
-        if img_max > img_min:
-            img_tensor = (img_tensor - img_min) / (img_max - img_min)
+        if per_sample:
+            img_min = img_tensor.amin(dim=(1, 2, 3), keepdim=True)
+            img_max = img_tensor.amax(dim=(1, 2, 3), keepdim=True)
+            span = img_max - img_min
+            img_tensor.sub_(img_min).div_(span.clamp_min(1e-12)).mul_(span > 0)
         else:
-            img_tensor = torch.zeros_like(img_tensor)
+            img_min = img_tensor.min()
+            img_max = img_tensor.max()
+            if img_max > img_min:
+                img_tensor.sub_(img_min).div_(img_max - img_min)
+            else:
+                img_tensor.zero_()
 
         # Move to (B, H, W, C) for ComfyUI Image format
         img_tensor = img_tensor.movedim(1, -1)
@@ -196,91 +215,15 @@ class Latent_Machine:
         return ({"samples": noise}, img_tensor)
 
     def generate_power_law_noise(self, batch_size, c, h, w, alpha):
-        # Generate White Noise (Standard Gaussian)
-        white_noise = torch.randn((batch_size, c, h, w), device=self.device)
-        
-        # Convert to Frequency Domain (FFT)
-        fft_noise = torch.fft.fft2(white_noise)
-        
-        # Create Frequency Grid
-        y = torch.fft.fftfreq(h, device=self.device)
-        x = torch.fft.fftfreq(w, device=self.device)
-        dy, dx = torch.meshgrid(y, x, indexing='ij')
-        
-        # Calculate distance from center (frequency magnitude)
-        # Add epsilon to avoid division by zero at DC component
-        frequency_magnitude = torch.sqrt(dy**2 + dx**2) + 1e-8
-        
-        # Apply Power Law Scaling: Amplitude ~ 1 / f^(alpha/2)
-        scale = 1.0 / (frequency_magnitude ** (alpha / 2.0))
-        
-        # Zero out the DC component (mean brightness) to keep it neutral
-        scale[0, 0] = 0 
-        
-        fft_structured = fft_noise * scale
-        
-        # Convert back to Spatial Domain (Inverse FFT)
-        structured_noise = torch.fft.ifft2(fft_structured).real
-        
-        return structured_noise
+        return power_law_noise(batch_size, c, h, w, alpha, self.device, generator=self.generator)
 
-    def generate_perlin_approx(self, batch_size, c, h, w):
+    def generate_perlin_noise(self, batch_size, c, h, w, octaves=4, lacunarity=2.0, persistence=0.5, tileable=False):
         """
-        Generates a Perlin-like noise by blending upsampled noise from multiple octaves.
-        This is faster than calculating actual Perlin noise per pixel on the CPU/GPU.
+        True gradient (Perlin) fractal noise. All octaves are evaluated in one vectorized
+        pass; with tileable the lattice wraps so opposite edges join seamlessly.
         """
-        noise = torch.zeros((batch_size, c, h, w), device=self.device)
-        
-        # Octaves: scale down, generate noise, scale up
-        octaves = [2, 4, 8, 16]
-        weights = [0.5, 0.25, 0.125, 0.0625] # 1/f amplitude falloff
-        
-        total_weight = 0
-        
-        for scale, weight in zip(octaves, weights):
-            # Calculate small dimensions
-            sh, sw = max(1, h // scale), max(1, w // scale)
-            
-            # Generate random noise at this scale
-            small_noise = torch.randn((batch_size, c, sh, sw), device=self.device)
-            
-            # Upsample to full size using bicubic interpolation for smoothness
-            upsampled = torch.nn.functional.interpolate(
-                small_noise, size=(h, w), mode='bicubic', align_corners=False
-            )
-            
-            noise += upsampled * weight
-            total_weight += weight
-            
-        # Add a bit of fine-grained white noise for texture
-        noise += torch.randn((batch_size, c, h, w), device=self.device) * 0.05
-        
-        return noise
+        return perlin_noise(batch_size, c, h, w, self.device, octaves=octaves, lacunarity=lacunarity,
+                            persistence=persistence, tileable=tileable, generator=self.generator)
 
     def generate_blue_noise(self, batch_size, c, h, w, beta=1.5):
-        # Generate White Noise (Standard Gaussian)
-        white_noise = torch.randn((batch_size, c, h, w), device=self.device)
-        
-        # Convert to Frequency Domain (FFT)
-        fft_noise = torch.fft.fft2(white_noise)
-        
-        # Create Frequency Grid
-        y = torch.fft.fftfreq(h, device=self.device)
-        x = torch.fft.fftfreq(w, device=self.device)
-        dy, dx = torch.meshgrid(y, x, indexing='ij')
-        
-        # Calculate distance from center (frequency magnitude)
-        frequency_magnitude = torch.sqrt(dy**2 + dx**2)
-        
-        # Apply High-Pass Scaling: Amplitude ~ f^(beta/2)
-        scale = frequency_magnitude ** (beta / 2.0)
-        
-        # Zero out DC component
-        scale[0, 0] = 0 
-        
-        fft_structured = fft_noise * scale
-        
-        # Convert back to Spatial Domain (Inverse FFT)
-        blue_noise = torch.fft.ifft2(fft_structured).real
-        
-        return blue_noise
+        return blue_noise(batch_size, c, h, w, self.device, beta=beta, generator=self.generator)
@@ -0,0 +1,170 @@
+import functools
+
+import torch
+import torch.fft
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Shared spectral noise generator (Latent_Machine + Upscale_Machine).
+#
+# Colored noise = white Gaussian noise shaped in the frequency domain by
+# amplitude ~ 1 / f^(alpha/2):
+#   alpha  0   : white      alpha  1 : pink (1/f)
+#   alpha  2   : brown      alpha  3 : plasma
+#   alpha -1.5 : blue (high-pass, f^0.75)
+# The input is real, so rfft2/irfft2 only touch the non-redundant half spectrum
+# (half the FFT work and memory of fft2/ifft2, identical result).
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+# Masks up to this many spectrum entries are cached on their device (latent sizes
+# and fixed noise tiles: ~0.5 MB each in float32). Larger ones are rebuilt per call, so
+# output-resolution masks never sit in VRAM where model_management can't free them.
+SPECTRAL_MASK_CACHE_MAX_ELEMENTS = 512 * 257
+
+
+def spectral_mask(h, w, alpha, device, dtype=torch.float32):
+    """
+    (h, w//2+1) amplitude mask for rfft2 spectra, DC zeroed. Small masks are cached
+    per (h, w, alpha, device, dtype).
+    """
+    if h * (w // 2 + 1) <= SPECTRAL_MASK_CACHE_MAX_ELEMENTS:
+        return _cached_spectral_mask(h, w, alpha, device, dtype)
+    return _build_spectral_mask(h, w, alpha, device, dtype)
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_spectral_mask(h, w, alpha, device, dtype):
+    return _build_spectral_mask(h, w, alpha, device, dtype)
+
+
+def _build_spectral_mask(h, w, alpha, device, dtype):
+    fy = torch.fft.fftfreq(h, device=device, dtype=torch.float64)
+    fx = torch.fft.rfftfreq(w, device=device, dtype=torch.float64)
+    frequency_magnitude = torch.sqrt(fy[:, None] ** 2 + fx[None, :] ** 2)
+    if alpha > 0:
+        # epsilon avoids division by zero at DC (zeroed below anyway)
+        frequency_magnitude = frequency_magnitude + 1e-8
+    mask = frequency_magnitude ** (-alpha / 2.0)
+    mask[0, 0] = 0
+    return mask.to(dtype)
+
+
+def make_generator(seed, device):
+    """Dedicated device-local generator — leaves the global torch RNG untouched."""
+    return torch.Generator(device=device).manual_seed(seed % 2**64)
+
+
+def sample_generators(seed, device, count, start=0):
+    """One generator per sample, seeded seed + index: sample k is reproducible on its own."""
+    return [make_generator(seed + start + i, device) for i in range(count)]
+
+
+def white_noise(shape, device, generator=None, dtype=torch.float32):
+    """
+    Standard Gaussian noise of `shape`. `generator` is None (global RNG), one generator,
+    or a list with one generator per sample along dim 0.
+    """
+    if isinstance(generator, (list, tuple)):
+        return torch.cat([torch.randn((1, *shape[1:]), device=device, generator=g, dtype=dtype)
+                          for g in generator])
+    return torch.randn(shape, device=device, generator=generator, dtype=dtype)
+
+
+def shape_spectrum(noise_bchw, alpha):
+    """Shape real noise (..., h, w) with the 1/f^(alpha/2) amplitude mask."""
+    h, w = noise_bchw.shape[-2:]
+    spectrum = torch.fft.rfft2(noise_bchw)
+    spectrum.mul_(spectral_mask(h, w, float(alpha), noise_bchw.device, noise_bchw.dtype))
+    return torch.fft.irfft2(spectrum, s=(h, w))
+
+
+def power_law_noise(batch_size, c, h, w, alpha, device, generator=None):
+    """Power-law colored noise (B,C,H,W). Not normalized."""
+    return shape_spectrum(white_noise((batch_size, c, h, w), device, generator), alpha)
+
+
+def blue_noise(batch_size, c, h, w, device, beta=1.5, generator=None):
+    """High-frequency (blue) noise: amplitude ~ f^(beta/2). Not normalized."""
+    return power_law_noise(batch_size, c, h, w, -beta, device, generator)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Gradient (Perlin) fractal noise.
+#
+# Perlin noise is bilinear in the lattice gradients: with fade weights and corner
+# offsets depending on y only or x only, one octave is
+#     noise = Ly @ Gy @ Rx + My @ Gx @ Nx
+# where Gy/Gx are the (cells_y x cells_x) gradient components and Ly, My, Rx, Nx
+# are sparse-structured interpolation matrices. Stacking the octaves' (G @ R)
+# products along the lattice dimension turns the whole fractal sum into ONE
+# batched matmul — no per-pixel gathers, no full-size resampling per octave.
+# Octave o has round(extent * lacunarity^o / PERLIN_BASE_PERIOD) cells per axis
+# (an integer count, so `tileable` can wrap the lattice for seamless edges).
+# ─────────────────────────────────────────────────────────────────────────────
+PERLIN_BASE_PERIOD = 32                 # coarsest octave cell size (latent px)
+PERLIN_MIN_PERIOD = 2                   # finest octave cell size kept (latent px)
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def _interpolation_matrices(size, cells, tileable, device):
+    """
+    (size x grid) matrices for one axis of one octave:
+      weight    : fade weights of the two surrounding lattice points
+      weighted_d: fade weight x signed offset to that lattice point
+    """
+    grid = cells if tileable else cells + 1
+    u = torch.arange(size, device=device, dtype=torch.float32) * (cells / size)
+    i0 = u.floor()
+    t = u - i0
+    i1 = i0 + 1
+    if tileable:
+        i1 = torch.remainder(i1, cells)
+    i0, i1 = i0.long()[:, None], i1.long()[:, None]
+    s = _fade(t)[:, None]
+    t = t[:, None]
+
+    weight = torch.zeros((size, grid), device=device)
+    weight.scatter_add_(1, i0, 1 - s).scatter_add_(1, i1, s)
+    weighted_d = torch.zeros((size, grid), device=device)
+    weighted_d.scatter_add_(1, i0, (1 - s) * t).scatter_add_(1, i1, s * (t - 1))
+    return weight, weighted_d
+
+
+def perlin_noise(batch_size, c, h, w, device, octaves=4, lacunarity=2.0, persistence=0.5,
+                 tileable=False, generator=None):
+    """
+    Fractal gradient noise (B,C,H,W): sum over octaves of persistence^o * perlin(lacunarity^o * x).
+    Not normalized. `generator` follows white_noise (None, one generator, or one per sample).
+    """
+    lattices = []
+    for o in range(max(1, int(octaves))):
+        if o and PERLIN_BASE_PERIOD / lacunarity ** o < PERLIN_MIN_PERIOD:
+            break           # finer octaves would alias below the pixel grid
+        cells_y = max(1, round(h * lacunarity ** o / PERLIN_BASE_PERIOD))
+        cells_x = max(1, round(w * lacunarity ** o / PERLIN_BASE_PERIOD))
+        lattices.append((cells_y, cells_x))
+
+    pad = 0 if tileable else 1
+    sizes = [(cy + pad) * (cx + pad) for cy, cx in lattices]
+
+    # Unit gradient per lattice point (normalized 2D Gaussian -> uniform direction)
+    grads = white_noise((batch_size, c, sum(sizes), 2), device, generator)
+    grads = grads / grads.norm(dim=-1, keepdim=True).clamp_min(1e-12)
+    grads = grads.reshape(batch_size * c, sum(sizes), 2)
+
+    left, right = [], []
+    start = 0
+    for o, (cells_y, cells_x) in enumerate(lattices):
+        amplitude = persistence ** o
+        my, ly = _interpolation_matrices(h, cells_y, tileable, device)
+        rx, nx = _interpolation_matrices(w, cells_x, tileable, device)
+        g = grads[:, start:start + sizes[o]].reshape(-1, cells_y + pad, cells_x + pad, 2)
+        start += sizes[o]
+        # y-gradient pairs with the y offset, x-gradient with the x offset
+        left += [ly * amplitude, my * amplitude]
+        right += [g[..., 0] @ rx.T, g[..., 1] @ nx.T]
+
+    return (torch.cat(left, dim=1) @ torch.cat(right, dim=1)).view(batch_size, c, h, w)
@@ -1,4 +1,10 @@
-from nodes import PreviewImage 
+import os
+from PIL import Image
+import folder_paths
+from comfy.cli_args import args
+from nodes import PreviewImage
+from .save_machine import tensor_batch_to_uint8, build_pnginfo
+
 
 class Preview_Machine(PreviewImage):
     @classmethod
@@ -16,4 +22,29 @@ class Preview_Machine(PreviewImage):
     FUNCTION = "save_images"
 
     def save_images(self, images, prompt=None, extra_pnginfo=None):
-        return super().save_images(images, filename_prefix="Preview_Machine", prompt=prompt, extra_pnginfo=extra_pnginfo)
+        """
+        Same files and UI payload as PreviewImage.save_images, but the batch is converted to
+        uint8 in one pass (tensor_batch_to_uint8) and the PNG metadata is built once.
+        """
+        filename_prefix = "Preview_Machine" + self.prefix_append
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(
+            filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
+
+        metadata = None
+        if not args.disable_metadata:
+            metadata = build_pnginfo(None, prompt, extra_pnginfo)
+
+        results = list()
+        for (batch_number, array) in enumerate(tensor_batch_to_uint8(images)):
+            img = Image.fromarray(array)
+            filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
+            file = f"{filename_with_batch_num}_{counter:05}_.png"
+            img.save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=self.compress_level)
+            results.append({
+                "filename": file,
+                "subfolder": subfolder,
+                "type": self.type
+            })
+            counter += 1
+
+        return { "ui": { "images": results } }
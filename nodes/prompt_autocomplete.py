@@ -1,8 +1,23 @@
 import os
+import bisect
+import collections
 import csv
+import gzip
+import heapq
 import json
+import random
+import re
+import threading
+import time
 from server import PromptServer
 from aiohttp import web
+from .asset_cache import FileCache, FILE_RECHECK_SECONDS, json_body, etag_matches, run_io
+from .asset_watcher import ASSET_WATCHER
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Directory for Prompt files
 PROMPT_DIR = os.path.join(os.path.dirname(__file__), "..", "prompt")
@@ -17,52 +32,324 @@ def list_prompt_files():
         print(f"[PromptAutocomplete] list_prompt_files error: {e}")
         return []
 
-def read_prompt_file(filename):
-    """Read and parse a CSV or JSON file."""
-    if not filename:
-        return []
-    path = os.path.join(PROMPT_DIR, filename)
-    if not os.path.exists(path):
-        print(f"[PromptAutocomplete] File not found: {path}")
-        return []
-    
+def parse_prompt_file(path):
+    """Parse a CSV or JSON prompt file into a list of strings."""
     data = []
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            # Simple CSV parsing: treat first column as the value
+            for row in reader:
+                if row:
+                    data.append(row[0].strip())
+    elif path.endswith(".json"):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            content = json.load(f)
+            # Expecting a list of strings or objects with 'name'/'prompt'
+            if isinstance(content, list):
+                for item in content:
+                    if isinstance(item, str):
+                        data.append(item)
+                    elif isinstance(item, dict):
+                        # Try to find a meaningful text field
+                        val = item.get("prompt") or item.get("text") or item.get("name") or item.get("value")
+                        if val:
+                            data.append(str(val))
+            elif isinstance(content, dict):
+                 # If it's a dict, maybe keys or values are the prompts? 
+                 # Let's assume keys are categories or names, and values are prompts if strings
+                 for k, v in content.items():
+                     if isinstance(v, str):
+                         data.append(v)
+                     elif isinstance(v, list):
+                         # Flatten list values
+                         data.extend([str(x) for x in v if isinstance(x, str)])
+    return data
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Search index, built once per file (rebuilt when its mtime/size change)
+#
+# Hits are ranked in tiers, each ordered by the same fuzzy score the browser
+# used (gaps between matched characters + 0.1 per trailing character):
+#   0. item starts with the query            — bisect over the sorted items
+#   1. a later word starts with the query    — bisect over the sorted words
+#   2. item contains the query               — trigram posting intersection
+#   3. query letters appear in order (fuzzy) — only while fewer than `limit`
+#                                              hits; character-mask prefilter
+# ─────────────────────────────────────────────────────────────────────────────
+SEARCH_DEFAULT_LIMIT = 100
+SEARCH_MAX_LIMIT = 1000
+_WORD_SPLIT = re.compile(r"[\s,()\[\]{}:;|/_-]+")
+
+
+def fuzzy_score(text, query):
+    """Subsequence match score (lower is better) or None; text and query lowercased."""
+    score = 0.0
+    last = -1
+    pos = 0
+    for ch in query:
+        i = text.find(ch, pos)
+        if i < 0:
+            return None
+        if last >= 0:
+            score += i - last - 1
+        last = i
+        pos = i + 1
+    return score + (len(text) - last - 1) * 0.1 if last >= 0 else 0.0
+
+
+def _char_mask(text):
+    mask = 0
+    for ch in set(text):
+        mask |= 1 << (ord(ch) & 63)
+    return mask
+
+
+class PromptIndex:
+    def __init__(self, items):
+        self.items = items
+        self.items_body, self.items_etag = json_body({"items": items})
+        self._lower = None
+        self._build_lock = threading.Lock()
+
+    def _build(self):
+        with self._build_lock:
+            if self._lower is None:
+                self._build_index()
+
+    def _build_index(self):
+        lower = [item.lower() for item in self.items]
+        self._prefixes = sorted((text, i) for i, text in enumerate(lower))
+        words = []
+        grams = collections.defaultdict(list)     # trigram -> ascending item indices
+        for i, text in enumerate(lower):
+            for word in set(_WORD_SPLIT.split(text)[1:]):
+                if word:
+                    words.append((word, i))
+            for gram in {text[j:j + 3] for j in range(len(text) - 2)}:
+                grams[gram].append(i)
+        words.sort()
+        self._words = words
+        self._grams = dict(grams)
+        self._masks = [_char_mask(text) for text in lower]
+        self._lower = lower
+
+    @staticmethod
+    def _prefix_range(pairs, query):
+        start = bisect.bisect_left(pairs, (query,))
+        end = bisect.bisect_left(pairs, (query + "\uffff",), start)
+        return (i for _, i in pairs[start:end])
+
+    def search(self, query, limit=SEARCH_DEFAULT_LIMIT):
+        """Up to `limit` best matching items, best first."""
+        query = query.lower()
+        if not query:
+            return self.items[:limit]
+        if self._lower is None:
+            self._build()
+        lower = self._lower
+
+        hits = []
+        seen = set()
+
+        def take(candidates, verify=None):
+            ranked = []
+            considered = set()
+            for i in candidates:
+                if i in seen or i in considered:
+                    continue
+                considered.add(i)
+                text = lower[i]
+                if verify is not None and not verify(text):
+                    continue
+                score = fuzzy_score(text, query)
+                if score is not None:
+                    ranked.append((score, len(text), i))
+            for _, _, i in heapq.nsmallest(limit - len(hits), ranked):
+                seen.add(i)
+                hits.append(self.items[i])
+            return len(hits) >= limit
+
+        if take(self._prefix_range(self._prefixes, query)):
+            return hits
+        if take(self._prefix_range(self._words, query)):
+            return hits
+
+        if len(query) >= 3:
+            postings = sorted((self._grams.get(query[j:j + 3], ()) for j in range(len(query) - 2)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:]) if postings[0] else ()
+        else:
+            candidates = range(len(lower))
+        if take(sorted(candidates), lambda text: query in text):
+            return hits
+
+        mask = _char_mask(query)
+        masks = self._masks
+        take(i for i in range(len(lower)) if masks[i] & mask == mask)
+        return hits
+
+
+def prompt_file_path(filename):
+    """Absolute path of a prompt file, or None for names outside PROMPT_DIR / unsupported types."""
+    if not filename or os.path.basename(filename) != filename or not filename.endswith((".csv", ".json")):
+        return None
+    return os.path.join(PROMPT_DIR, filename)
+
+
+# Indexes kept in memory (LRU); names come from request queries, so the map is bounded
+PROMPT_INDEX_MAX_FILES = 64
+
+_indexes = collections.OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def prompt_index_cache(filename):
+    """FileCache of a file's PromptIndex (None for invalid names and files that don't exist)."""
+    with _indexes_lock:
+        cache = _indexes.get(filename)
+        if cache is not None:
+            _indexes.move_to_end(filename)
+            return cache
+    path = prompt_file_path(filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    with _indexes_lock:
+        cache = _indexes.get(filename)
+        if cache is None:
+            cache = _indexes[filename] = FileCache(path, lambda p: PromptIndex(parse_prompt_file(p)))
+            while len(_indexes) > PROMPT_INDEX_MAX_FILES:
+                _indexes.popitem(last=False)[1].close()
+        return cache
+
+
+def _report_read_error(filename, error):
+    if isinstance(error, FileNotFoundError):
+        print(f"[PromptAutocomplete] File not found: {prompt_file_path(filename)}")
+    else:
+        print(f"[PromptAutocomplete] Error reading {filename}: {error}")
+
+
+def prompt_index(filename):
+    """PromptIndex of a prompt file (cached until the file changes); None if unavailable."""
+    cache = prompt_index_cache(filename)
+    if cache is None:
+        if prompt_file_path(filename) is not None:
+            _report_read_error(filename, FileNotFoundError())
+        return None
     try:
-        if filename.endswith(".csv"):
-            with open(path, "r", encoding="utf-8-sig") as f:
-                reader = csv.reader(f)
-                # Simple CSV parsing: treat first column as the value
-                for row in reader:
-                    if row:
-                        data.append(row[0].strip())
-        elif filename.endswith(".json"):
-            with open(path, "r", encoding="utf-8-sig") as f:
-                content = json.load(f)
-                # Expecting a list of strings or objects with 'name'/'prompt'
-                if isinstance(content, list):
-                    for item in content:
-                        if isinstance(item, str):
-                            data.append(item)
-                        elif isinstance(item, dict):
-                            # Try to find a meaningful text field
-                            val = item.get("prompt") or item.get("text") or item.get("name") or item.get("value")
-                            if val:
-                                data.append(str(val))
-                elif isinstance(content, dict):
-                     # If it's a dict, maybe keys or values are the prompts? 
-                     # Let's assume keys are categories or names, and values are prompts if strings
-                     for k, v in content.items():
-                         if isinstance(v, str):
-                             data.append(v)
-                         elif isinstance(v, list):
-                             # Flatten list values
-                             data.extend([str(x) for x in v if isinstance(x, str)])
+        return cache.get()
+    except Exception as e:
+        _report_read_error(filename, e)
+    return None
+
 
+async def prompt_index_async(filename):
+    """prompt_index for the REST routes: parsing runs off the event loop, warm indexes come from memory."""
+    with _indexes_lock:
+        cache = _indexes.get(filename)
+        if cache is not None:
+            _indexes.move_to_end(filename)
+    if cache is None:
+        # Unknown name: the existence check is a stat, so it runs on the light lane
+        cache = await run_io(("autocomplete/cache", filename), prompt_index_cache, filename, light=True)
+        if cache is None:
+            return None
+    try:
+        return await cache.aget()
     except Exception as e:
-        print(f"[PromptAutocomplete] Error reading {filename}: {e}")
-        return []
-        
-    return data
+        _report_read_error(filename, e)
+    return None
+
+
+def read_prompt_file(filename):
+    """Read and parse a CSV or JSON file (cached until the file changes)."""
+    index = prompt_index(filename)
+    return index.items if index is not None else []
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Bundle: every prompt file in one response for the browser's local mode.
+# Serialized and compressed once; rebuilt only when a file in PROMPT_DIR is
+# added, removed or rewritten (signature = names + mtimes + sizes).
+# ─────────────────────────────────────────────────────────────────────────────
+BUNDLE_GZIP_LEVEL = 6
+BUNDLE_BROTLI_QUALITY = 9
+
+
+def prompt_dir_signature():
+    signature = []
+    try:
+        with os.scandir(PROMPT_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith((".csv", ".json")) and entry.is_file():
+                    st = entry.stat()
+                    signature.append((entry.name, st.st_mtime_ns, st.st_size))
+    except FileNotFoundError:
+        pass
+    return tuple(sorted(signature))
+
+
+class PromptBundle:
+    """{"files": {filename: items}} pre-serialized, with gzip/brotli variants and their ETags."""
+
+    def __init__(self, signature):
+        self.signature = signature
+        body, etag = json_body({"files": {name: read_prompt_file(name) for name, _, _ in signature}})
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, BUNDLE_GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=BUNDLE_BROTLI_QUALITY)
+        # One ETag per encoding: the bytes differ, so the validators must too
+        self.etags = {enc: etag if enc == "identity" else f'{etag[:-1]}-{enc}"' for enc in self.bodies}
+
+    def encoding_for(self, request):
+        accepted = {part.split(";")[0].strip().lower() for part in request.headers.get("Accept-Encoding", "").split(",")}
+        for enc in ("br", "gzip"):
+            if enc in accepted and enc in self.bodies:
+                return enc
+        return "identity"
+
+
+_bundle = None
+_bundle_checked = 0.0
+_bundle_lock = threading.Lock()
+
+
+def prompt_bundle():
+    global _bundle, _bundle_checked
+    signature = prompt_dir_signature()
+    with _bundle_lock:
+        if _bundle is None or _bundle.signature != signature:
+            _bundle = PromptBundle(signature)
+        _bundle_checked = time.monotonic()
+        return _bundle
+
+
+def _on_prompt_dir_change(changed, removed):
+    """Asset watcher callback: drop the bundle so the next request rebuilds it."""
+    global _bundle
+    if any(name.endswith((".csv", ".json")) for name in changed + removed):
+        with _bundle_lock:
+            _bundle = None
+
+
+ASSET_WATCHER.subscribe(PROMPT_DIR, _on_prompt_dir_change)
+
+
+async def prompt_bundle_async():
+    """prompt_bundle for the REST route: served from memory while the watcher vouches for it,
+    or when validated within FILE_RECHECK_SECONDS."""
+    global _bundle_checked
+    bundle = _bundle
+    if bundle is not None and (ASSET_WATCHER.is_watching(PROMPT_DIR)
+                               or time.monotonic() - _bundle_checked < FILE_RECHECK_SECONDS):
+        return bundle
+    if bundle is not None:
+        signature = await run_io("autocomplete/signature", prompt_dir_signature, light=True)
+        if signature == bundle.signature and _bundle is bundle:
+            _bundle_checked = time.monotonic()
+            return bundle
+    return await run_io("autocomplete/bundle", prompt_bundle)
+
 
 class PromptAutocomplete:
     @classmethod
@@ -86,12 +373,54 @@ class PromptAutocomplete:
 @PromptServer.instance.routes.get("/sata/autocomplete/list")
 async def list_files(request):
     """Return all available prompt files"""
-    files = list_prompt_files()
+    files = await run_io("autocomplete/list", list_prompt_files, light=True)
     return web.json_response({"files": files})
 
 @PromptServer.instance.routes.get("/sata/autocomplete/get")
 async def get_file_content(request):
     """Return content of a specific file"""
+    index = await prompt_index_async(request.query.get("file"))
+    if index is None:
+        return web.json_response({"items": []})
+    headers = {"ETag": index.items_etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, index.items_etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=index.items_body, content_type="application/json", headers=headers)
+
+@PromptServer.instance.routes.get("/sata/autocomplete/search")
+async def search_file(request):
+    """Return the top `limit` ranked matches for `q` in one file"""
     filename = request.query.get("file")
-    items = read_prompt_file(filename)
-    return web.json_response({"items": items})
+    try:
+        limit = min(max(int(request.query.get("limit", SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = SEARCH_DEFAULT_LIMIT
+    index = await prompt_index_async(filename)
+    if index is None:
+        return web.json_response({"items": [], "total": 0})
+    query = request.query.get("q", "")
+    # Trigram/fuzzy tiers (and the first search's index build) are CPU work: off the event loop
+    items = await run_io(("autocomplete/search", filename, query, limit), index.search, query, limit)
+    return web.json_response({"items": items, "total": len(index.items)})
+
+@PromptServer.instance.routes.get("/sata/autocomplete/random")
+async def random_item(request):
+    """Return one random entry of a file"""
+    index = await prompt_index_async(request.query.get("file"))
+    items = index.items if index is not None else []
+    return web.json_response({"item": random.choice(items) if items else None})
+
+@PromptServer.instance.routes.get("/sata/autocomplete/bundle")
+async def get_bundle(request):
+    """Return every prompt file in one compressed, ETag-validated response"""
+    try:
+        bundle = await prompt_bundle_async()
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+    encoding = bundle.encoding_for(request)
+    headers = {"ETag": bundle.etags[encoding], "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request, bundle.etags[encoding]):
+        return web.Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=bundle.bodies[encoding], content_type="application/json", headers=headers)
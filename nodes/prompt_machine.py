@@ -1,8 +1,11 @@
 # prompt_machine_node.py
 import os
 import csv
+import collections
+import threading
 from server import PromptServer
 from aiohttp import web
+from .asset_cache import FileCache, json_body, etag_matches, run_io
 
 # Directory for CSV files (adjust if needed)
 CSV_DIR = os.path.join(os.path.dirname(__file__), "..", "asset")
@@ -14,77 +17,147 @@ def list_csv_files():
         print(f"[PromptMachine] list_csv_files error: {e}")
         return []
 
-def read_names_from_csv(filename):
-    """Return list of names (stripped) from CSV's 'name' column."""
-    if not filename:
-        return []
-    path = os.path.join(CSV_DIR, filename)
-    if not os.path.exists(path):
-        print(f"[PromptMachine] CSV not found: {path}")
-        return []
-    try:
+def normalize_name(name):
+    """Key for case-insensitive lookups: casefolded, inner whitespace collapsed."""
+    return " ".join(name.split()).casefold()
+
+
+class CsvTable:
+    """
+    Parsed style CSV (header with a 'name' column; positive/negative/note optional):
+      names  : non-empty names, stripped, in file order
+      rows   : name -> (positive, negative, note); the first row of a name wins
+      folded : normalize_name(name) -> row, for case-insensitive lookups
+      names_body, names_etag : pre-serialized /sata/prompt_machine/names payload
+    """
+
+    def __init__(self, path):
+        self.names = []
+        self.rows = {}
+        self.folded = {}
+        filename = os.path.basename(path)
         with open(path, "r", encoding="utf-8-sig") as f:
             reader = csv.DictReader(f)
+            field_map = {fn.strip().lower(): fn for fn in reader.fieldnames or []}
             if not reader.fieldnames:
                 print(f"[PromptMachine] CSV has no header: {filename}")
-                return []
-            field_map = {fn.strip().lower(): fn for fn in reader.fieldnames}
-            if "name" not in field_map:
-                print(f"[PromptMachine] CSV missing 'name' column: {filename}")
-                return []
-            name_field = field_map["name"]
-            names = []
-            for row in reader:
-                raw = row.get(name_field)
-                if raw is None:
-                    continue
-                val = raw.strip()
-                if val:
-                    names.append(val)
-            return names
+            elif "name" not in field_map:
+                print(f"[PromptMachine] 'name' column missing in CSV: {filename}")
+            else:
+                name_field = field_map["name"]
+                pos_field = field_map.get("positive", "positive")
+                neg_field = field_map.get("negative", "negative")
+                note_field = field_map.get("note", "note")
+                for row in reader:
+                    cell = row.get(name_field)
+                    if cell is None:
+                        continue
+                    name = cell.strip()
+                    if name:
+                        self.names.append(name)
+                    if name in self.rows:
+                        continue
+                    entry = ((row.get(pos_field) or "").strip(),
+                             (row.get(neg_field) or "").strip(),
+                             (row.get(note_field) or "").strip())
+                    self.rows[name] = entry
+                    self.folded.setdefault(normalize_name(name), entry)
+        self.names_body, self.names_etag = json_body({"names": self.names})
+
+    def lookup(self, name, match_case=True):
+        target = name.strip()
+        row = self.rows.get(target)
+        if row is None and not match_case:
+            row = self.folded.get(normalize_name(target))
+        return row
+
+
+# Tables kept in memory (LRU); names come from request queries, so the map is bounded
+CSV_TABLE_MAX_FILES = 64
+
+_tables = collections.OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def csv_file_path(filename):
+    """Absolute path of a style CSV, or None for names outside CSV_DIR / non-CSV files."""
+    if not filename or not isinstance(filename, str) or os.path.basename(filename) != filename or not filename.endswith(".csv"):
+        return None
+    return os.path.join(CSV_DIR, filename)
+
+
+def csv_table_cache(filename):
+    """FileCache of a CsvTable for a file in CSV_DIR (None for invalid names and files that don't exist)."""
+    with _tables_lock:
+        cache = _tables.get(filename)
+        if cache is not None:
+            _tables.move_to_end(filename)
+            return cache
+    path = csv_file_path(filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    with _tables_lock:
+        cache = _tables.get(filename)
+        if cache is None:
+            cache = _tables[filename] = FileCache(path, CsvTable)
+            while len(_tables) > CSV_TABLE_MAX_FILES:
+                _tables.popitem(last=False)[1].close()
+        return cache
+
+
+def _report_csv_error(filename, error):
+    if isinstance(error, FileNotFoundError):
+        print(f"[PromptMachine] CSV not found: {os.path.join(CSV_DIR, filename)}")
+    else:
+        print(f"[PromptMachine] Error reading {filename}: {error}")
+
+
+def csv_table(filename):
+    """CsvTable for a file in CSV_DIR, parsed once and re-parsed when it changes; None if unavailable."""
+    cache = csv_table_cache(filename)
+    if cache is None:
+        if csv_file_path(filename) is not None:
+            _report_csv_error(filename, FileNotFoundError())
+        return None
+    try:
+        return cache.get()
     except Exception as e:
-        print(f"[PromptMachine] read_names_from_csv error for {filename}: {e}")
-        return []
+        _report_csv_error(filename, e)
+    return None
+
+
+async def csv_table_async(filename):
+    """csv_table for the REST routes: parsing runs off the event loop, warm tables come from memory."""
+    with _tables_lock:
+        cache = _tables.get(filename)
+        if cache is not None:
+            _tables.move_to_end(filename)
+    if cache is None:
+        # Unknown name: the existence check is a stat, so it runs on the light lane
+        cache = await run_io(("prompt_machine/cache", filename), csv_table_cache, filename, light=True)
+        if cache is None:
+            return None
+    try:
+        return await cache.aget()
+    except Exception as e:
+        _report_csv_error(filename, e)
+    return None
+
+
+def read_names_from_csv(filename):
+    """Return list of names (stripped) from CSV's 'name' column."""
+    table = csv_table(filename)
+    return list(table.names) if table is not None else []
 
-def read_prompt_row(csv_file, name):
+def read_prompt_row(csv_file, name, match_case=True):
     """Return (positive, negative, note) for a given csv_file and name.
-       Matching is whitespace-trimmed and exact on content (case-sensitive by default)."""
-    if not csv_file or not isinstance(csv_file, str) or csv_file == "None":
-        return ("", "", "")
+       Matching is whitespace-trimmed and exact on content (case-sensitive by default);
+       with match_case=False, case and inner whitespace are ignored when there is no exact match."""
     if not name or not isinstance(name, str) or name == "None":
         return ("", "", "")
-    path = os.path.join(CSV_DIR, csv_file)
-    if not os.path.exists(path):
-        print(f"[PromptMachine] CSV file not found: {path}")
-        return ("", "", "")
-    try:
-        with open(path, "r", encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            if not reader.fieldnames:
-                print(f"[PromptMachine] CSV has no header: {csv_file}")
-                return ("", "", "")
-            field_map = {fn.strip().lower(): fn for fn in reader.fieldnames}
-            if "name" not in field_map:
-                print(f"[PromptMachine] 'name' column missing in CSV: {csv_file}")
-                return ("", "", "")
-            name_field = field_map["name"]
-            pos_field = field_map.get("positive", "positive")
-            neg_field = field_map.get("negative", "negative")
-            note_field = field_map.get("note", "note")
-
-            target = name.strip()
-            for row in reader:
-                cell = row.get(name_field)
-                if cell is None:
-                    continue
-                if cell.strip() == target:
-                    pos = (row.get(pos_field) or "").strip()
-                    neg = (row.get(neg_field) or "").strip()
-                    note = (row.get(note_field) or "").strip()
-                    return (pos, neg, note)
-    except Exception as e:
-        print(f"[PromptMachine] read_prompt_row error for {csv_file}, {name}: {e}")
-    return ("", "", "")
+    table = csv_table(csv_file)
+    row = table.lookup(name, match_case) if table is not None else None
+    return row if row is not None else ("", "", "")
 
 
 class Prompt_Style_Machine:
@@ -110,7 +183,10 @@ class Prompt_Style_Machine:
                 # make 'name' a free text field (STRING) — avoids list validation problems
                 "name": ("STRING", {"default": default_name}),
             },
-            "optional": {}
+            "optional": {
+                "match_case": ("BOOLEAN", {"default": True,
+                                           "tooltip": "Off: fall back to a case- and whitespace-insensitive name match"}),
+            }
         }
 
     RETURN_TYPES = ("STRING",)
@@ -118,9 +194,9 @@ class Prompt_Style_Machine:
     FUNCTION = "get_prompts"
     CATEGORY = "SATA_UtilityNode"
 
-    def get_prompts(self, csv_file, name):
+    def get_prompts(self, csv_file, name, match_case=True):
 
-        pos, neg, note = read_prompt_row(csv_file, name)
+        pos, neg, note = read_prompt_row(csv_file, name, match_case)
 
         return (pos,)
 
@@ -175,16 +251,20 @@ class Prompt_Machine:
 @PromptServer.instance.routes.get("/sata/prompt_machine/csvs")
 async def list_csvs(request):
     """Return all available CSV files"""
-    files = list_csv_files()
+    files = await run_io("prompt_machine/csvs", list_csv_files, light=True)
     return web.json_response({"csvs": files})
 
 
 @PromptServer.instance.routes.get("/sata/prompt_machine/names")
 async def list_names(request):
     """Return names from a selected CSV"""
-    csv_file = request.query.get("csv")
-    names = read_names_from_csv(csv_file) if csv_file else []
-    return web.json_response({"names": names})
+    table = await csv_table_async(request.query.get("csv"))
+    if table is None:
+        return web.json_response({"names": []})
+    headers = {"ETag": table.names_etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, table.names_etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=table.names_body, content_type="application/json", headers=headers)
 
 
 @PromptServer.instance.routes.get("/sata/prompt_machine/get")
@@ -195,5 +275,11 @@ async def get_prompt(request):
     """
     csv_file = request.query.get("csv")
     name = request.query.get("name")
-    pos, neg, note = read_prompt_row(csv_file, name)
+    match_case = request.query.get("match_case", "1").lower() not in ("0", "false", "no")
+    pos, neg, note = ("", "", "")
+    if name and name != "None":
+        table = await csv_table_async(csv_file)
+        row = table.lookup(name, match_case) if table is not None else None
+        if row is not None:
+            pos, neg, note = row
     return web.json_response({"positive": pos, "negative": neg, "note": note})
\ No newline at end of file
@@ -1,41 +1,20 @@
-import json
-import os
 from server import PromptServer
 from aiohttp import web
+from .asset_cache import RESOLUTIONS, resolution_config, etag_matches
 
 NODE_NAME = "Resolution_Machine"
 
-# Path to JSON config (root of SATA_UtilityNode folder)
-CONFIG_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), "asset","resolutions.json"
-)
-
-def load_config():
-    if not os.path.exists(CONFIG_PATH):
-        raise FileNotFoundError(f"[{NODE_NAME}] resolutions.json not found at {CONFIG_PATH}")
-    with open(CONFIG_PATH, "r", encoding="utf-8-sig") as f:
-        return json.load(f)
-
-
 class Resolution_Machine:
     @classmethod
     def INPUT_TYPES(cls):
-        config = load_config()
+        config = resolution_config(NODE_NAME)
 
         # all models
-        models = list(config["models"].keys())
+        models = list(config.models)
         default_model = models[0] if models else "Unknown"
 
-        # Collect ALL possible resolutions to pass validation
-        all_resolutions = set(["Custom"])
-        if "resolutions" in config:
-            for bucket in config["resolutions"].values():
-                for dim in bucket.values():
-                    all_resolutions.update(dim.keys())
-        
-        # We can't sort mixed types effortlessly if any, but they are strings.
-        # Sorting helps UI consistency if fallback happens, though JS overrides it.
-        resolutions_list = sorted(list(all_resolutions))
+        # ALL possible resolutions, so any bucket's selection passes validation
+        resolutions_list = list(config.resolutions_list)
 
         return {
             "required": {
@@ -54,35 +33,23 @@ class Resolution_Machine:
     CATEGORY = "SATA_UtilityNode"
 
     def get_resolution(self, model, dimension, resolution, custom_width, custom_height, megapixel="None"):
-        config = load_config()
+        config = resolution_config(NODE_NAME)
 
-        if model not in config["models"]:
+        if model not in config.config["models"]:
             raise ValueError(f"[{NODE_NAME}] Unknown model: {model}")
 
         if resolution == "Custom":
             w, h = custom_width, custom_height
         else:
-            # Search for resolution string in the specific bucket/dimension
-            # Iterate over tiers to find the bucket that has this model?
-            # Actually config["models"][model] gives list of buckets.
-            buckets = config["models"][model]
-            
-            resolution_data = None
-            for bucket in buckets:
-                # Check if this bucket has the selected dimension
-                if bucket in config["resolutions"]:
-                     if dimension in config["resolutions"][bucket]:
-                         if resolution in config["resolutions"][bucket][dimension]:
-                             resolution_data = config["resolutions"][bucket][dimension][resolution]
-                             break
-            
-            if not resolution_data:
-                 # Fallback: maybe the user switched model and the resolution is now invalid, or it is custom manual
-                 # If obscure mismatch, default to custom values provided
-                 print(f"[{NODE_NAME}] Warning: resolution '{resolution}' not found for model '{model}' dim '{dimension}', using Custom")
-                 w, h = custom_width, custom_height
+            # First bucket of the model that has this dimension/resolution (precomputed)
+            found = config.lookup.get((model, dimension, resolution))
+            if found is None:
+                # Fallback: maybe the user switched model and the resolution is now invalid, or it is custom manual
+                # If obscure mismatch, default to custom values provided
+                print(f"[{NODE_NAME}] Warning: resolution '{resolution}' not found for model '{model}' dim '{dimension}', using Custom")
+                w, h = custom_width, custom_height
             else:
-                 w, h = resolution_data["width"], resolution_data["height"]
+                w, h = found
 
         if megapixel != "None":
             mp_map = {
@@ -108,7 +75,10 @@ class Resolution_Machine:
 @PromptServer.instance.routes.get("/SATA_UtilityNode/resolutions_config")
 async def get_resolutions_config(request):
     try:
-        config = load_config()
-        return web.json_response(config)
+        config = await RESOLUTIONS.aget()
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
+    headers = {"ETag": config.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, config.etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=config.body, content_type="application/json", headers=headers)
@@ -1,5 +1,5 @@
 import os
-import hashlib
+import functools
 from datetime import datetime
 import json
 import piexif
@@ -9,6 +9,9 @@ from PIL.PngImagePlugin import PngInfo
 import numpy as np
 import folder_paths
 import re
+import threading
+from .save_writer import WRITER, NAME_INDEX
+from .workflow_store import WORKFLOW_REF_KEY, workflow_store
 
 
 
@@ -41,37 +44,52 @@ def make_filename(template: str):
     return get_timestamp("%Y-%m-%d-%H%M%S") if filename == "" else filename
 
 
-def resolve_placeholders(template: str, prompt=None, extra_pnginfo=None) -> str:
-    """Resolve placeholders of the form %node_name/field% by looking into extra_pnginfo and prompt.
-
-    This is a best-effort resolver: it attempts several lookup strategies and falls back to leaving
-    the placeholder unchanged when a value can't be found.
-    """
-    if not template or '%' not in template:
-        return template
-
-    # Build title/type to node ID mapping from extra_pnginfo
-    node_title_to_id = {}
-    node_type_to_ids = {}
-    if extra_pnginfo and isinstance(extra_pnginfo, dict) and "workflow" in extra_pnginfo:
-        workflow = extra_pnginfo["workflow"]
-        if isinstance(workflow, dict) and "nodes" in workflow:
-            for node in workflow["nodes"]:
-                if isinstance(node, dict):
-                    node_id = str(node.get("id"))
-                    node_title = node.get("title")
-                    node_type = node.get("type")
-                    if node_title:
-                        node_title_to_id[node_title] = node_id
-                    if node_type:
-                        if node_type not in node_type_to_ids:
-                            node_type_to_ids[node_type] = []
-                        node_type_to_ids[node_type].append(node_id)
-
-    def lookup(key: str):
+# ─────────────────────────────────────────────────────────────────────────────
+# %node/field% placeholders
+#
+# Templates are parsed once (compile_template, LRU-cached) into literal text and
+# lookup keys. The maps those keys are resolved against — workflow title/type ->
+# node id, and the first node carrying each input field — are built once per
+# prompt (WorkflowIndex) and shared by every template resolved while that prompt
+# executes, so each placeholder costs a few dict lookups however large the graph.
+# ─────────────────────────────────────────────────────────────────────────────
+PLACEHOLDER_PATTERN = re.compile(r"%([^%]+)%")
+TEMPLATE_CACHE_SIZE = 256
+
+
+class WorkflowIndex:
+    """Lookup tables for one (prompt, extra_pnginfo) pair."""
+
+    def __init__(self, prompt=None, extra_pnginfo=None):
+        self.prompt = prompt if isinstance(prompt, dict) else None
+        self.title_to_id = {}
+        self.type_to_id = {}
+        self.field_values = {}
+
+        if extra_pnginfo and isinstance(extra_pnginfo, dict) and "workflow" in extra_pnginfo:
+            workflow = extra_pnginfo["workflow"]
+            if isinstance(workflow, dict) and "nodes" in workflow:
+                for node in workflow["nodes"]:
+                    if isinstance(node, dict):
+                        node_id = str(node.get("id"))
+                        node_title = node.get("title")
+                        node_type = node.get("type")
+                        if node_title:
+                            self.title_to_id[node_title] = node_id          # last title wins
+                        if node_type:
+                            self.type_to_id.setdefault(node_type, node_id)  # first of its type
+
+        # Field-name fallback: the first node (prompt order) that has the input
+        for ndata in (self.prompt or {}).values():
+            if isinstance(ndata, dict) and isinstance(ndata.get("inputs"), dict):
+                for field, value in ndata["inputs"].items():
+                    self.field_values.setdefault(field, value)
+
+    def lookup(self, key: str):
         if not key:
             return None
-        
+        prompt = self.prompt
+
         node_ref = None
         field = key
         if '/' in key:
@@ -81,11 +99,9 @@ def resolve_placeholders(template: str, prompt=None, extra_pnginfo=None) -> str:
         if node_ref:
             if prompt and node_ref in prompt:
                 node_id = node_ref
-            elif node_ref in node_title_to_id:
-                node_id = node_title_to_id[node_ref]
-            elif node_ref in node_type_to_ids:
-                node_id = node_type_to_ids[node_ref][0]
-        
+            else:
+                node_id = self.title_to_id.get(node_ref) or self.type_to_id.get(node_ref)
+
         if node_id and prompt and node_id in prompt:
             node_data = prompt[node_id]
             if isinstance(node_data, dict) and "inputs" in node_data:
@@ -93,34 +109,271 @@ def resolve_placeholders(template: str, prompt=None, extra_pnginfo=None) -> str:
                 if field in inputs:
                     return inputs[field]
 
-        # Fallback: check if the key is directly in prompt or if it is just a field name in some node
-        if prompt and isinstance(prompt, dict):
+        # Fallback: the key is a prompt node id, or just a field name in some node
+        if prompt:
             if key in prompt:
                 return prompt[key]
-            for nid, ndata in prompt.items():
-                if isinstance(ndata, dict) and "inputs" in ndata:
-                    inputs = ndata.get("inputs", {})
-                    if field in inputs:
-                        return inputs[field]
-
+            return self.field_values.get(field)
         return None
 
-    pattern = re.compile(r"%([^%]+)%")
 
-    def repl(m):
-        key = m.group(1)
-        val = lookup(key)
-        if val is None:
-            return m.group(0)
-        # If value is a list/dict, JSON-serialize; otherwise string
+_last_index = None
+_last_index_lock = threading.Lock()
+
+
+def workflow_index(prompt=None, extra_pnginfo=None) -> WorkflowIndex:
+    """WorkflowIndex for this prompt; rebuilt only when a different prompt object comes in."""
+    global _last_index
+    with _last_index_lock:
+        index = _last_index
+        if index is None or index.source[0] is not prompt or index.source[1] is not extra_pnginfo:
+            index = WorkflowIndex(prompt, extra_pnginfo)
+            index.source = (prompt, extra_pnginfo)      # strong refs: identity stays valid
+            _last_index = index
+        return index
+
+
+class PlaceholderTemplate:
+    """A template split once into literal text and %key% lookups."""
+
+    def __init__(self, template: str):
+        self.template = template
+        self.parts = []         # literal str, or (key, original "%key%" text)
+        pos = 0
+        for m in PLACEHOLDER_PATTERN.finditer(template):
+            self.parts.append(template[pos:m.start()])
+            self.parts.append((m.group(1), m.group(0)))
+            pos = m.end()
+        self.parts.append(template[pos:])
+        self.has_placeholders = len(self.parts) > 1
+
+    def render(self, index: WorkflowIndex) -> str:
+        if not self.has_placeholders:
+            return self.template
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            val = index.lookup(part[0])
+            if val is None:
+                out.append(part[1])
+            elif isinstance(val, (dict, list)):
+                # If value is a list/dict, JSON-serialize; otherwise string
+                try:
+                    out.append(json.dumps(val))
+                except Exception:
+                    out.append(str(val))
+            else:
+                out.append(str(val))
+        return "".join(out)
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template: str) -> PlaceholderTemplate:
+    return PlaceholderTemplate(template)
+
+
+def resolve_placeholders(template: str, prompt=None, extra_pnginfo=None) -> str:
+    """Resolve placeholders of the form %node_name/field% by looking into extra_pnginfo and prompt.
+
+    This is a best-effort resolver: it attempts several lookup strategies and falls back to leaving
+    the placeholder unchanged when a value can't be found.
+    """
+    if not template or '%' not in template:
+        return template
+    return compile_template(template).render(workflow_index(prompt, extra_pnginfo))
+
+
+# Encoder settings per compression preset (passed to PIL's Image.save).
+#   fast     : lowest CPU time — PNG zlib level 1, lossy WebP at method 0, plain JPEG
+#   balanced : PNG level 4, lossless WebP at moderate effort, optimized JPEG q95
+#   archival : smallest files / highest fidelity — PNG optimize (level 9 + filter search),
+#              lossless WebP, JPEG q100 (the historical behaviour)
+COMPRESSION_PRESETS = {
+    "fast": {
+        "png": {"compress_level": 1},
+        "jpeg": {"quality": 95, "optimize": False},
+        "webp": {"lossless": False, "quality": 90, "method": 0},
+    },
+    "balanced": {
+        "png": {"compress_level": 4},
+        "jpeg": {"quality": 95, "optimize": True},
+        "webp": {"lossless": True, "quality": 50, "method": 3},
+    },
+    "archival": {
+        "png": {"optimize": True},
+        "jpeg": {"quality": 100, "optimize": True},
+        "webp": {"lossless": True, "quality": 100, "optimize": True},
+    },
+}
+
+
+def encoder_options(extension, compression="archival", quality_jpeg_or_webp=None, lossless_webp=None):
+    """PIL save kwargs for extension + preset; explicit quality/lossless override the archival preset."""
+    options = dict(COMPRESSION_PRESETS.get(compression, COMPRESSION_PRESETS["archival"])[extension])
+    if compression == "archival":
+        if quality_jpeg_or_webp is not None and extension != 'png':
+            options["quality"] = quality_jpeg_or_webp
+        if lossless_webp is not None and extension == 'webp':
+            options["lossless"] = lossless_webp
+    return options
+
+
+def tensor_batch_to_uint8(images):
+    """
+    (B,H,W,C) float [0,1] tensor -> (B,H,W,C) uint8 numpy array, same truncation as
+    np.clip(255 * x).astype(uint8). Index the result for zero-copy per-image views.
+      - GPU: scale, clamp and cast run as one pass over the batch on the device, then a
+        single copy back through a freshly pinned buffer (one sync for the whole batch)
+      - CPU: images are scaled into one reused float scratch and cast straight into the
+        output, so no full-batch float temporaries are allocated
+    """
+    import torch
+
+    with torch.inference_mode():
+        images = images.detach()
+        if images.device.type == "cuda":
+            u8 = images.mul(255.0).clamp_(0, 255).to(torch.uint8)
+            host = torch.empty(u8.shape, dtype=torch.uint8, pin_memory=True)
+            host.copy_(u8, non_blocking=True)
+            torch.cuda.current_stream(u8.device).synchronize()
+            return host.numpy()
+
+        images = images.cpu()
+        out = torch.empty(images.shape, dtype=torch.uint8)
+        scratch = torch.empty(images.shape[1:], dtype=images.dtype)
+        for i in range(images.shape[0]):
+            torch.mul(images[i], 255.0, out=scratch).clamp_(0, 255)
+            out[i].copy_(scratch)
+        return out.numpy()
+
+
+# JPEG stores EXIF in a single APP1 segment (64 KiB minus headers)
+JPEG_MAX_EXIF_BYTES = 65533
+
+
+# With compress_metadata, PNG text chunks above this size are stored zlib-compressed (zTXt/iTXt)
+PNG_COMPRESS_MIN_BYTES = 1024
+
+
+def serialize_metadata(prompt=None, extra_pnginfo=None):
+    """
+    Serialize prompt and extra_pnginfo once per save call.
+    Returns (prompt_json, extra_json): prompt_json is None when the prompt is not JSON-serializable;
+    extra_json maps each extra_pnginfo key to its JSON string (None without extra_pnginfo).
+    """
+    prompt_json = None
+    if prompt is not None:
         try:
-            if isinstance(val, (dict, list)):
-                return json.dumps(val)
-            return str(val)
+            prompt_json = json.dumps(prompt)
         except Exception:
-            return str(val)
+            pass
+    extra_json = None
+    if extra_pnginfo is not None:
+        extra_json = {x: json.dumps(extra_pnginfo[x]) for x in extra_pnginfo}
+    return prompt_json, extra_json
+
+
+def build_exif(comment, prompt=None, extra_pnginfo=None, serialized=None):
+    """
+    EXIF bytes carrying our metadata as a JSON UserComment (None if there is nothing to embed).
+    The JSON object is assembled from the pre-serialized parts (same text json.dumps would produce).
+    """
+    if not (comment or extra_pnginfo or prompt):
+        return None
+    prompt_json, extra_json = serialized or serialize_metadata(prompt, extra_pnginfo)
+    try:
+        parts = []
+        if comment:
+            parts.append('"comment": ' + json.dumps(comment))
+        if prompt:
+            if prompt_json is None:
+                return None
+            parts.append('"prompt": ' + prompt_json)
+        if extra_pnginfo:
+            if WORKFLOW_REF_KEY in extra_json and "workflow" not in extra_json:
+                # Sidecar mode: only the reference into the workflow store
+                parts.append(f'"{WORKFLOW_REF_KEY}": ' + extra_json[WORKFLOW_REF_KEY])
+            else:
+                parts.append('"workflow": ' + extra_json.get("workflow", "{}"))
+
+        return piexif.dump({
+            "Exif": {
+                piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump("{" + ", ".join(parts) + "}", encoding="unicode")
+            },
+        })
+    except Exception:
+        # piexif may fail for some payloads; save without EXIF
+        return None
+
+
+def build_pnginfo(comment, prompt=None, extra_pnginfo=None, serialized=None, compress=False):
+    """PngInfo text chunks; with compress, chunks over PNG_COMPRESS_MIN_BYTES are zlib-compressed."""
+    prompt_json, extra_json = serialized or serialize_metadata(prompt, extra_pnginfo)
+    metadata = PngInfo()
+
+    def add(key, value):
+        metadata.add_text(key, value, zip=compress and len(value) > PNG_COMPRESS_MIN_BYTES)
 
-    return pattern.sub(repl, template)
+    if comment:
+        add("parameters", comment)
+
+    if prompt is not None:
+        add("prompt", prompt_json if prompt_json is not None else str(prompt))
+
+    if extra_json is not None:
+        for x, value in extra_json.items():
+            add(x, value)
+    return metadata
+
+
+def build_metadata_options(extension, comment, prompt=None, extra_pnginfo=None, serialized=None,
+                           compress=False, label=""):
+    """Encoder kwargs carrying the metadata (pnginfo / exif), built once and shared by a whole batch."""
+    if extension == 'png':
+        return {"pnginfo": build_pnginfo(comment, prompt, extra_pnginfo, serialized, compress)}
+    exif_bytes = build_exif(comment, prompt, extra_pnginfo, serialized)
+    if exif_bytes and extension == 'jpeg' and len(exif_bytes) > JPEG_MAX_EXIF_BYTES:
+        print(f"[Save_Machine] Metadata ({len(exif_bytes)} bytes) exceeds the JPEG EXIF limit, "
+              f"saving {label or 'images'} without it")
+        exif_bytes = None
+    return {"exif": exif_bytes} if exif_bytes else {}
+
+
+def write_image(img, file_path, extension, save_options):
+    """
+    Encode one PIL image and write it to file_path (runs on the writer pool in async mode).
+    save_options already carry the metadata (PNG text chunks / EXIF segment or chunk), so the file
+    is written exactly once: into a temp file in the same folder, then renamed over file_path.
+    """
+    directory, name = os.path.split(file_path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    # os.open (not mkstemp) so the file gets the usual umask-based permissions
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format=extension.upper(), **save_options)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_claimed_image(img, file_path, *args, **kwargs):
+    """write_image into a claimed name; drops the empty placeholder if encoding fails."""
+    try:
+        write_image(img, file_path, *args, **kwargs)
+    except Exception:
+        try:
+            if os.path.getsize(file_path) == 0:
+                os.remove(file_path)
+        except OSError:
+            pass
+        raise
 
 
 class Save_Machine:
@@ -135,9 +388,20 @@ class Save_Machine:
                 "path_and_filename": ("STRING", {"default": "%time", "tooltip": "Supports %date, %time, and custom prompt %placeholders%"}),
                 "extension": ((['png', 'jpeg', 'webp']),),
             },
+            "optional": {
+                "compression": (list(COMPRESSION_PRESETS.keys()), {"default": "archival",
+                                                                   "tooltip": "fast: quickest encode, larger files (lossy WebP). balanced: moderate. archival: smallest lossless files, slowest"}),
+                "compress_metadata": ("BOOLEAN", {"default": False,
+                                                  "tooltip": "PNG: store large prompt/workflow text chunks zlib-compressed (zTXt/iTXt)"}),
+                "async_write": ("BOOLEAN", {"default": False,
+                                            "tooltip": "Encode and write in the background so the next prompt can start immediately. File names are claimed up front as empty placeholder files, so the node preview can show broken images until the write finishes"}),
+                "metadata_mode": (["embed", "sidecar"], {"default": "embed",
+                                                        "tooltip": "embed: full prompt/workflow in every image. sidecar: workflow stored once in output/.workflows (by hash), images carry only the hash and their seeds"}),
+            },
             "hidden": {
                 "prompt": "PROMPT",
-                "extra_pnginfo": "EXTRA_PNGINFO"
+                "extra_pnginfo": "EXTRA_PNGINFO",
+                "unique_id": "UNIQUE_ID",
             },
         }
 
@@ -147,7 +411,7 @@ class Save_Machine:
     OUTPUT_NODE = True
     CATEGORY = "SATA_UtilityNode"
 
-    def save_files(self, images, path_and_filename, extension, prompt=None, extra_pnginfo=None):
+    def save_files(self, images, path_and_filename, extension, compression="archival", compress_metadata=False, async_write=False, metadata_mode="embed", prompt=None, extra_pnginfo=None, unique_id=None):
         # Resolve placeholders first (uses prompt)
         try:
             resolved = resolve_placeholders(str(path_and_filename), prompt, extra_pnginfo)
@@ -172,29 +436,29 @@ class Save_Machine:
                 print(f'The path `{output_path.strip()}` specified doesn\'t exist! Creating directory.')
                 os.makedirs(output_path, exist_ok=True)
 
+        # Sidecar mode: the graph goes to the content-addressed store (once per distinct
+        # workflow), the images only carry its hash and the per-image values
+        if metadata_mode == "sidecar" and (prompt is not None or extra_pnginfo is not None):
+            ref = workflow_store(self.output_dir).put(prompt, extra_pnginfo)
+            prompt, extra_pnginfo = None, {WORKFLOW_REF_KEY: ref}
+
+        # Serialize prompt/workflow once for the whole batch (comment, PNG chunks and EXIF share it)
+        serialized = serialize_metadata(prompt, extra_pnginfo)
+
         comment_parts = []
         if prompt is not None:
-            try:
-                prompt_text = json.dumps(prompt)
-            except Exception:
-                prompt_text = str(prompt)
+            prompt_text = serialized[0] if serialized[0] is not None else str(prompt)
             comment_parts.append(f"Prompt: {handle_whitespace(prompt_text)}")
 
         comment = "\n".join(comment_parts).strip()
 
-        # Resolve any %node/field% placeholders in filename and path using prompt
-        try:
-            filename = resolve_placeholders(filename, prompt, extra_pnginfo)
-            path = resolve_placeholders(path, prompt, extra_pnginfo)
-        except Exception:
-            # Best-effort: if resolution fails, continue with original templates
-            pass
+        subfolder = os.path.normpath(path)
 
-        # We always use quality=100 and lossless_webp=True
+        # Archival keeps quality=100 and lossless_webp=True; other presets trade size for speed
         filenames = self.save_images(images, output_path, filename, comment, extension,
-                                     100, True, prompt, extra_pnginfo)
+                                     100, True, prompt, extra_pnginfo, async_write=async_write, compression=compression,
+                                     serialized=serialized, compress_metadata=compress_metadata, node=unique_id)
 
-        subfolder = os.path.normpath(path)
         ui_images = [ {"filename": fn, "subfolder": subfolder if subfolder != '.' else '', "type": 'output'} for fn in filenames ]
         
         # Return the absolute path of the first saved image (or output directory if none)
@@ -202,103 +466,45 @@ class Save_Machine:
         
         return {"ui": {"images": ui_images}, "result": (first_file_path,)}
 
-    def save_images(self, images, output_path, filename_prefix, comment, extension, quality_jpeg_or_webp, lossless_webp, prompt=None, extra_pnginfo=None) -> list:
+    def save_images(self, images, output_path, filename_prefix, comment, extension, quality_jpeg_or_webp, lossless_webp, prompt=None, extra_pnginfo=None,
+                    async_write=False, compression="archival", serialized=None,
+                    compress_metadata=False, node=None) -> list:
         img_count = 1
         paths = []
 
-        # images is a torch tensor (B,H,W,C) or a list/iterable of such tensors
-        try:
-            import torch
-            is_torch = True
-        except Exception:
-            is_torch = False
-
-        # Normalize input to list of images
-        imgs = None
-        if is_torch and hasattr(images, 'ndim'):
-            imgs = [images[i] for i in range(images.shape[0])] if images.ndim == 4 else [images]
+        # images is a torch tensor (B,H,W,C) or a list/iterable of such tensors / arrays.
+        # Tensors are converted batch-wise to uint8 (one fused op, one transfer).
+        if hasattr(images, 'ndim') and hasattr(images, 'cpu'):
+            imgs = tensor_batch_to_uint8(images if images.ndim == 4 else images.unsqueeze(0))
         elif isinstance(images, (list, tuple)):
-            imgs = images
+            imgs = [tensor_batch_to_uint8(im.unsqueeze(0))[0] if hasattr(im, 'cpu') else im for im in images]
         else:
             imgs = [images]
 
-        def find_unique_name(base_name: str, ext: str) -> str:
-            """Return a file name (with extension) that does not collide on disk. Uses _0001 style suffixes."""
-            candidate = f"{base_name}.{ext}"
-            candidate_path = os.path.join(output_path, candidate)
-            if not os.path.exists(candidate_path):
-                return candidate
-            idx = 1
-            while True:
-                candidate = f"{base_name}_{idx:04d}.{ext}"
-                candidate_path = os.path.join(output_path, candidate)
-                if not os.path.exists(candidate_path):
-                    return candidate
-                idx += 1
+        # Encoder settings + metadata payload (PngInfo / EXIF bytes) built once, reused for every image
+        save_options = encoder_options(extension, compression, quality_jpeg_or_webp, lossless_webp)
+        save_options.update(build_metadata_options(extension, comment, prompt, extra_pnginfo, serialized,
+                                                   compress=compress_metadata, label=filename_prefix))
 
         for image in imgs:
-            # Convert to PIL Image
-            if is_torch and hasattr(image, 'cpu'):
-                i = 255. * image.cpu().numpy()
-                img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            else:
-                # assume numpy array
-                arr = np.array(image)
-                if arr.dtype != np.uint8:
-                    arr = np.clip(arr * 255.0, 0, 255).astype(np.uint8)
-                img = Image.fromarray(arr)
+            # Convert to PIL Image (synchronously — the tensor may be reused once we return)
+            arr = np.asarray(image)
+            if arr.dtype != np.uint8:
+                arr = np.clip(arr * 255.0, 0, 255).astype(np.uint8)
+            img = Image.fromarray(arr)
 
             # Base filename (without extension)
             base_name = filename_prefix
-
-            if extension == 'png':
-                metadata = PngInfo()
-                if comment:
-                    metadata.add_text("parameters", comment)
-
-                if prompt is not None:
-                    try:
-                        metadata.add_text("prompt", json.dumps(prompt))
-                    except Exception:
-                        metadata.add_text("prompt", str(prompt))
-
-                if extra_pnginfo is not None:
-                    for x in extra_pnginfo:
-                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
-
-                outname = find_unique_name(base_name, 'png')
-                img.save(os.path.join(output_path, outname), pnginfo=metadata, optimize=True)
+            ext_name = 'jpg' if extension == 'jpeg' else extension
+
+            # Claimed atomically on disk (O_EXCL) from the per-directory name index
+            outname = NAME_INDEX.claim(output_path, base_name, ext_name)
+            file_path = os.path.join(output_path, outname)
+            args = (img, file_path, extension, save_options)
+            if async_write:
+                WRITER.submit(file_path, write_claimed_image, *args, node=node)
             else:
-                ext = extension
-                if ext == 'jpeg':
-                    ext_name = 'jpg'
-                else:
-                    ext_name = ext
-
-                outname = find_unique_name(base_name, ext_name)
-                file_path = os.path.join(output_path, outname)
-                img.save(file_path, optimize=True, quality=quality_jpeg_or_webp, lossless=lossless_webp if ext_name=='webp' else False)
-
-                # Insert EXIF user comment with our metadata
-                if comment or extra_pnginfo or prompt:
-                    try:
-                        exif_dict = {}
-                        if comment:
-                            exif_dict["comment"] = comment
-                        if prompt:
-                            exif_dict["prompt"] = prompt
-                        if extra_pnginfo:
-                            exif_dict["workflow"] = extra_pnginfo.get("workflow", {})
-                        
-                        exif_bytes = piexif.dump({
-                            "Exif": {
-                                piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump(json.dumps(exif_dict), encoding="unicode")
-                            },
-                        })
-                        piexif.insert(exif_bytes, file_path)
-                    except Exception:
-                        # piexif may fail for some formats; ignore silently
-                        pass
+                write_claimed_image(*args)
 
             paths.append(outname)
             img_count += 1
@@ -0,0 +1,169 @@
+import atexit
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+NODE_NAME = "Save_Machine"
+FAILED_EVENT = "sata.save_failed"
+
+# Encoder threads and the cap on queued images; at the cap, new saves block until a
+# slot frees up (backpressure instead of unbounded memory growth).
+WRITER_MAX_WORKERS = min(4, os.cpu_count() or 1)
+WRITER_MAX_PENDING = 32
+
+
+class BackgroundWriter:
+    """
+    Bounded background pool for image encode + write jobs.
+
+      - threads, not processes: PIL releases the GIL while encoding/compressing, and
+        ComfyUI's custom-node module loading does not survive spawn-based pickling
+      - target names are claimed on disk (NAME_INDEX) before submit, so naming stays
+        deterministic while files are still being written
+      - failures are logged and pushed to the browser (FAILED_EVENT) by the worker,
+        tagged with the node that queued the write — they never fail a later save
+      - flush() waits for every queued job; it also runs at interpreter exit
+    """
+
+    def __init__(self, max_workers=WRITER_MAX_WORKERS, max_pending=WRITER_MAX_PENDING):
+        self.max_workers = max_workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="sata_save_writer")
+            return self._executor
+
+    def submit(self, path, fn, *args, node=None, **kwargs):
+        """Queue fn(*args, **kwargs) writing `path` (already claimed); blocks while the queue is full.
+        `node` (the saving node's id) is attached to the failure report."""
+        self._slots.acquire()
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+
+        def done(f):
+            with self._lock:
+                self._pending.discard(f)
+            self._slots.release()
+            error = f.exception()
+            if error is not None:
+                self._report(path, error, node)
+
+        future.add_done_callback(done)
+        return future
+
+    def flush(self):
+        """Block until every queued job has finished."""
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                return
+            for future in pending:
+                try:
+                    future.result()
+                except Exception:
+                    pass        # reported by the done callback
+
+    @staticmethod
+    def _report(path, error, node):
+        print(f"[{NODE_NAME}] Background write failed for {path}: {error}")
+        try:
+            from server import PromptServer
+            PromptServer.instance.send_sync(FAILED_EVENT, {"node": node, "file": os.path.basename(path),
+                                                           "error": str(error)})
+        except Exception:
+            pass        # no server (scripts, benchmarks) or no clients
+
+
+WRITER = BackgroundWriter()
+atexit.register(WRITER.flush)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Unique file names: base.ext, then base_0001.ext, base_0002.ext, ...
+#
+# Each directory is scanned once; afterwards the highest suffix per (base, ext)
+# is tracked in memory, so a name costs one open() however many files share the
+# prefix. Names are claimed with O_CREAT | O_EXCL (an empty placeholder the
+# writer replaces), which makes collisions with other writers — other nodes,
+# other processes, files added behind our back — safe: on EEXIST the next
+# suffix is tried and the index catches up.
+# ─────────────────────────────────────────────────────────────────────────────
+NAME_INDEX_MAX_DIRS = 256
+_SUFFIXED = re.compile(r"^(.*)_(\d{4,})$")
+
+
+class NameIndex:
+    def __init__(self):
+        self._dirs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name):
+        return os.path.normcase(name)
+
+    def _scan(self, directory):
+        """{(base, ext): highest used index} — plain base.ext counts as index 0."""
+        used = {}
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return used
+        with entries:
+            for entry in entries:
+                stem, dot, ext = entry.name.rpartition(".")
+                if not dot:
+                    continue
+                ext = self._key(ext)
+                plain = (self._key(stem), ext)
+                used.setdefault(plain, 0)
+                match = _SUFFIXED.match(stem)
+                if match:
+                    key = (self._key(match.group(1)), ext)
+                    used[key] = max(used.get(key, 0), int(match.group(2)))
+        return used
+
+    def _used(self, directory):
+        directory = os.path.normcase(os.path.abspath(directory))
+        used = self._dirs.get(directory)
+        if used is None:
+            if len(self._dirs) >= NAME_INDEX_MAX_DIRS:
+                self._dirs.clear()
+            used = self._dirs[directory] = self._scan(directory)
+        return used
+
+    def claim(self, directory, base_name, ext):
+        """Atomically create and return a new unique file name (placeholder file on disk)."""
+        key = (self._key(base_name), self._key(ext))
+        with self._lock:
+            used = self._used(directory)
+            index = used[key] + 1 if key in used else 0
+            while True:
+                name = f"{base_name}.{ext}" if index == 0 else f"{base_name}_{index:04d}.{ext}"
+                try:
+                    fd = os.open(os.path.join(directory, name), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+                except FileExistsError:
+                    index += 1
+                    continue
+                os.close(fd)
+                used[key] = index
+                return name
+
+    def forget(self, directory):
+        with self._lock:
+            self._dirs.pop(os.path.normcase(os.path.abspath(directory)), None)
+
+
+NAME_INDEX = NameIndex()
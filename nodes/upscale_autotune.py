@@ -0,0 +1,183 @@
+import contextlib
+import json
+import os
+import platform
+import threading
+import time
+
+import torch
+from comfy import model_management
+
+from .upscale_tiling import choose_tiles_per_batch
+
+NODE_NAME = "Upscale_Machine"
+
+# Persisted tile choices, one entry per (architecture, device, dtype):
+#   {"tile": best tile, "px_per_s": measured throughput, "max_tile": OOM ceiling}
+# Generated at runtime (not shipped) — delete the file to re-tune everything.
+PROFILE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "asset", "upscale_profiles.json"
+)
+
+AUTOTUNE_CANDIDATES = [128, 192, 256, 320, 384, 512, 640, 768, 896, 1024]
+AUTOTUNE_REPEATS = 3
+
+_profiles = None
+_lock = threading.Lock()
+
+
+def device_label(device):
+    """Stable, human-readable device identity used in profile keys."""
+    device = torch.device(device)
+    if device.type == "cuda":
+        try:
+            return f"cuda:{torch.cuda.get_device_name(device)}"
+        except Exception:
+            return "cuda"
+    if device.type == "cpu":
+        return f"cpu:{platform.processor() or platform.machine()}:{torch.get_num_threads()}t"
+    return device.type
+
+
+def profile_key(arch_name, device, dtype):
+    return f"{arch_name}|{device_label(device)}|{str(dtype).replace('torch.', '')}"
+
+
+def _load():
+    global _profiles
+    if _profiles is None:
+        try:
+            with open(PROFILE_PATH, "r", encoding="utf-8") as f:
+                _profiles = json.load(f)
+        except FileNotFoundError:
+            _profiles = {}
+        except Exception as e:
+            print(f"[{NODE_NAME}] Ignoring unreadable {PROFILE_PATH}: {e}")
+            _profiles = {}
+    return _profiles
+
+
+def _save():
+    tmp_path = PROFILE_PATH + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_profiles, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, PROFILE_PATH)
+    except Exception as e:
+        print(f"[{NODE_NAME}] Could not write {PROFILE_PATH}: {e}")
+
+
+def get_profile(arch_name, device, dtype):
+    """Return the stored entry for (arch, device, dtype) or None."""
+    with _lock:
+        entry = _load().get(profile_key(arch_name, device, dtype))
+        return dict(entry) if entry else None
+
+
+def update_profile(arch_name, device, dtype, **fields):
+    with _lock:
+        profiles = _load()
+        key = profile_key(arch_name, device, dtype)
+        profiles[key] = {**profiles.get(key, {}), **fields}
+        _save()
+
+
+def clear_profile(arch_name, device, dtype):
+    with _lock:
+        if _load().pop(profile_key(arch_name, device, dtype), None) is not None:
+            _save()
+
+
+def resolve_tile(arch_name, device, dtype, default_tile):
+    """Tuned tile if one is stored, otherwise the default — never above a recorded OOM ceiling."""
+    entry = get_profile(arch_name, device, dtype) or {}
+    tile = entry.get("tile", default_tile)
+    max_tile = entry.get("max_tile")
+    return min(tile, max_tile) if max_tile else tile
+
+
+def record_oom(arch_name, device, dtype, failed_tile):
+    """Persist an OOM ceiling so later jobs start below the tile that just failed."""
+    entry = get_profile(arch_name, device, dtype) or {}
+    ceiling = failed_tile // 2
+    if entry.get("max_tile") and entry["max_tile"] <= ceiling:
+        return
+    fields = {"max_tile": ceiling}
+    if entry.get("tile", 0) > ceiling:
+        fields["tile"] = ceiling
+    update_profile(arch_name, device, dtype, **fields)
+
+
+def _sync(device):
+    if torch.device(device).type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def _run_batch(function, batch):
+    with torch.inference_mode():
+        return function(batch)
+
+
+@torch.inference_mode()
+def autotune(function, arch_name, device, dtype, scale, overlap=32, max_batch=1,
+             candidates=None, max_tile=None, make_context=None, input_dtype=None, executor=None):
+    """
+    Measure useful throughput (non-overlapping output px/s) for each candidate tile and
+    persist the best one under (arch, device, dtype). `function` is the per-batch forward
+    (eager — candidates would each trigger a recompile otherwise); `make_context` returns
+    the autocast context to time it under and `input_dtype` overrides the dtype of the
+    synthetic input (e.g. float32 input under bf16 autocast). With an `executor`, each
+    timing step runs one batch per worker concurrently on it, the same layout the tiles
+    run with (CPU mode). Candidates never exceed `max_tile` or a recorded OOM ceiling;
+    tuning stops at the first OOM and records the last tile that fit as the ceiling.
+    """
+    input_dtype = input_dtype or dtype
+    candidates = [t for t in (candidates or AUTOTUNE_CANDIDATES) if t > 2 * overlap]
+    ceilings = [t for t in (max_tile, (get_profile(arch_name, device, dtype) or {}).get("max_tile")) if t]
+    if ceilings:
+        candidates = [t for t in candidates if t <= min(ceilings)]
+    copies = getattr(executor, "_max_workers", 1) if executor is not None else 1
+
+    def step(batch):
+        if executor is None:
+            function(batch)
+            return
+        for future in [executor.submit(_run_batch, function, batch) for _ in range(copies)]:
+            future.result()
+
+    results = {}
+    ceiling = None
+    for tile in candidates:
+        n = choose_tiles_per_batch(device, tile, tile, scale,
+                                   element_size=torch.tensor([], dtype=input_dtype).element_size(),
+                                   max_batch=max_batch)
+        batch = torch.rand((n, 3, tile, tile), device=device, dtype=input_dtype)
+        try:
+            with make_context() if make_context else contextlib.nullcontext():
+                step(batch)                 # warm-up (allocator, cudnn autotune)
+                _sync(device)
+                start = time.perf_counter()
+                for _ in range(AUTOTUNE_REPEATS):
+                    step(batch)
+                _sync(device)
+                elapsed = (time.perf_counter() - start) / AUTOTUNE_REPEATS
+        except model_management.OOM_EXCEPTION:
+            model_management.soft_empty_cache()
+            ceiling = max(results) if results else tile // 2
+            break
+        finally:
+            del batch
+        useful_px = copies * n * (tile - overlap) ** 2 * scale * scale
+        results[tile] = useful_px / max(elapsed, 1e-9)
+        print(f"[{NODE_NAME}] autotune {arch_name} tile={tile} batch={n}: {results[tile] / 1e6:.2f} MP/s")
+
+    if not results:
+        raise RuntimeError(f"[{NODE_NAME}] autotune found no tile size that fits on {device_label(device)}")
+
+    best = max(results, key=results.get)
+    fields = {"tile": best, "px_per_s": round(results[best]), "tuned_at": int(time.time())}
+    if ceiling:
+        fields["max_tile"] = ceiling
+    update_profile(arch_name, device, dtype, **fields)
+    print(f"[{NODE_NAME}] autotune {arch_name} on {device_label(device)}: best tile={best}")
+    return best
@@ -0,0 +1,262 @@
+import functools
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import torch
+from comfy import model_management
+from spandrel import ModelLoader
+
+NODE_NAME = "Upscale_Machine"
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Process-wide cache of deserialized spandrel models.
+#
+# Entries are keyed by (real path, mtime_ns, size) so a model file that is
+# replaced on disk is reloaded automatically. Eviction is LRU, bounded both by
+# entry count and by total weight bytes, and entries are also dropped while
+# system RAM is below MODEL_CACHE_MIN_FREE_RAM (ComfyUI model_management view).
+# ─────────────────────────────────────────────────────────────────────────────
+MODEL_CACHE_MAX_ENTRIES = 4
+MODEL_CACHE_MAX_BYTES = 4 * 1024 ** 3
+MODEL_CACHE_MIN_FREE_RAM = 2 * 1024 ** 3
+
+
+def _file_key(model_path):
+    st = os.stat(model_path)
+    return (os.path.realpath(model_path), st.st_mtime_ns, st.st_size)
+
+
+def _model_nbytes(model):
+    """Bytes held by the parameters and buffers of a spandrel model descriptor."""
+    inner = model.model
+    total = 0
+    for t in list(inner.parameters()) + list(inner.buffers()):
+        total += t.numel() * t.element_size()
+    return total
+
+
+def _free_ram():
+    try:
+        return model_management.get_free_memory(torch.device("cpu"))
+    except Exception:
+        return None
+
+
+class ModelCache:
+    """LRU cache of loaded upscale models, shared by every Upscale_Machine instance."""
+
+    def __init__(self, max_entries=MODEL_CACHE_MAX_ENTRIES, max_bytes=MODEL_CACHE_MAX_BYTES,
+                 min_free_ram=MODEL_CACHE_MIN_FREE_RAM):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.min_free_ram = min_free_ram
+        self._entries = OrderedDict()   # file key -> (model, nbytes)
+        self._lock = threading.Lock()
+        self.on_evict = []              # fn(model) for every model dropped from the cache
+
+    @property
+    def total_bytes(self):
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get(self, model_path):
+        """Return the cached model for model_path, loading it from disk on a miss."""
+        key = _file_key(model_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        model = ModelLoader().load_from_file(model_path)
+        if model is None:
+            return None
+        model.eval()
+        nbytes = _model_nbytes(model)
+
+        with self._lock:
+            # Drop stale versions of the same file (mtime/size changed on disk)
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                self._evicted(self._entries.pop(stale)[0])
+            self._entries[key] = (model, nbytes)
+            self._trim(keep=key)
+        return model
+
+    def trim(self):
+        """Evict entries until count, byte budget and free-RAM constraints are met."""
+        with self._lock:
+            self._trim()
+
+    def clear(self):
+        with self._lock:
+            while self._entries:
+                self._evicted(self._entries.popitem(last=False)[1][0])
+
+    def _evicted(self, model):
+        for callback in self.on_evict:
+            callback(model)
+
+    def _trim(self, keep=None):
+        def evict_oldest():
+            for k in self._entries:
+                if k != keep:
+                    model, nbytes = self._entries.pop(k)
+                    print(f"[{NODE_NAME}] Evicting cached model {os.path.basename(k[0])} "
+                          f"({nbytes / 1024 ** 2:.0f} MB)")
+                    self._evicted(model)
+                    return True
+            return False
+
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            if not evict_oldest():
+                break
+
+        free = _free_ram()
+        while free is not None and free < self.min_free_ram and evict_oldest():
+            free = _free_ram()
+
+
+MODEL_CACHE = ModelCache()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# torch.compile artifact cache.
+#
+# Compiled graphs are keyed by a stable identity instead of id(model):
+#   (architecture, weight hash, dtype, tile shape, device)
+# so a model reloaded from disk (or evicted from MODEL_CACHE and loaded again)
+# reuses the graph compiled for identical weights. All compiled wrappers for a
+# given weight hash wrap one canonical nn.Module, which is the module that the
+# node moves to the device and casts before running tiles. When MODEL_CACHE
+# evicts a model, its canonical module and compiled graphs are dropped with it,
+# so compiled wrappers never keep evicted weights alive past the RAM budget.
+#
+# Set SATA_INDUCTOR_CACHE_DIR to persist inductor FX graph artifacts on disk so
+# the compile cost is also skipped after a ComfyUI restart.
+# ─────────────────────────────────────────────────────────────────────────────
+COMPILED_CACHE_MAX_ENTRIES = 8
+COMPILE_CACHE_DIR = os.environ.get("SATA_INDUCTOR_CACHE_DIR")
+
+
+def weight_hash(module):
+    """SHA-1 over parameter/buffer names, shapes, dtypes and bytes. Memoized per module object."""
+    cached = _WEIGHT_HASHES.get(module)
+    if cached is not None:
+        return cached
+    h = hashlib.sha1()
+    for name, t in list(module.named_parameters()) + list(module.named_buffers()):
+        t = t.detach()
+        h.update(f"{name}:{tuple(t.shape)}:{t.dtype}".encode())
+        h.update(t.cpu().contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+    digest = h.hexdigest()
+    _WEIGHT_HASHES[module] = digest
+    return digest
+
+
+_WEIGHT_HASHES = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=None)
+def _has_triton():
+    try:
+        import triton  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class CompiledModelCache:
+    """Bounded LRU of torch.compile'd modules keyed by model identity and input signature."""
+
+    def __init__(self, max_entries=COMPILED_CACHE_MAX_ENTRIES, cache_dir=COMPILE_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()   # key -> compiled module
+        self._modules = {}              # weight hash -> canonical nn.Module
+        self._lock = threading.Lock()
+        self._disk_cache_ready = False
+        self._warned = set()
+
+    def canonical_module(self, upscale_model):
+        """Return the nn.Module that compiled graphs for these weights wrap (registers it on first use)."""
+        inner = upscale_model.model
+        if not _has_triton():
+            return inner
+        digest = weight_hash(inner)
+        with self._lock:
+            return self._modules.setdefault(digest, inner)
+
+    def get(self, upscale_model, compile_mode, dtype, tile_shape, device):
+        """
+        Return the compiled module for (arch, weights, dtype, tile shape, device).
+        Falls back to the eager canonical module when Triton is missing or compile fails.
+        """
+        inner = self.canonical_module(upscale_model)
+        if not _has_triton():
+            self._warn_once("triton", "Triton not installed (Windows), skipping torch.compile.")
+            return inner
+
+        key = (type(inner).__name__, weight_hash(inner), str(dtype), tuple(tile_shape), str(device))
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+
+        self._setup_disk_cache()
+        try:
+            compiled = torch.compile(inner, mode=compile_mode, dynamic=False)
+        except Exception as ex:
+            self._warn_once("compile", f"torch.compile unavailable ({ex}), using eager mode.")
+            return inner
+
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            live = {k[1] for k in self._entries}
+            for digest in [d for d in self._modules if d not in live and self._modules[d] is not inner]:
+                del self._modules[digest]
+        return compiled
+
+    def forget(self, upscale_model):
+        """Drop the compiled graphs wrapping this model's weights (called on MODEL_CACHE eviction)."""
+        inner = upscale_model.model
+        digest = _WEIGHT_HASHES.get(inner)
+        if digest is None:
+            return      # never hashed, so never registered here
+        with self._lock:
+            if self._modules.get(digest) is not inner:
+                return  # another loaded copy of the same weights is canonical
+            del self._modules[digest]
+            for key in [k for k in self._entries if k[1] == digest]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._modules.clear()
+
+    def _setup_disk_cache(self):
+        if self._disk_cache_ready or not self.cache_dir:
+            return
+        self._disk_cache_ready = True
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", self.cache_dir)
+            import torch._inductor.config as inductor_config
+            inductor_config.fx_graph_cache = True
+            print(f"[{NODE_NAME}] Persisting inductor artifacts in {os.environ['TORCHINDUCTOR_CACHE_DIR']}")
+        except Exception as ex:
+            print(f"[{NODE_NAME}] Could not enable on-disk compile cache ({ex}).")
+
+    def _warn_once(self, tag, message):
+        if tag not in self._warned:
+            self._warned.add(tag)
+            print(f"[{NODE_NAME}] {message}")
+
+
+COMPILED_CACHE = CompiledModelCache()
+MODEL_CACHE.on_evict.append(COMPILED_CACHE.forget)
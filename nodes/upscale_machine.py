@@ -1,67 +1,83 @@
+import contextlib
+import functools
 import torch
 import torch.nn.functional as F
 import folder_paths
 import comfy.utils
 from comfy import model_management
-from spandrel import ModelLoader
+from .noise_engine import blue_noise
+from .upscale_cache import MODEL_CACHE, COMPILED_CACHE
+from .upscale_tiling import (batched_tiled_scale, choose_tiles_per_batch, tile_grid, accumulation_device,
+                             cpu_thread_layout, cpu_tile_executor, cpu_supports_bf16)
+from .upscale_autotune import autotune as autotune_tiles, get_profile, record_oom, resolve_tile
+from .upscale_stream import (STREAM_TILE, ModelStage, ResizeStage, pull_region, expand_region,
+                             allocate_output, _TileCounter)
+
+
+# Chained-model grain comes from one NOISE_TILE x NOISE_TILE blue-noise tile. FFT-shaped
+# noise is periodic, so the tile repeats seamlessly and no full-resolution noise field
+# (nor its FFT buffers) is ever built; streamed tiles and the whole frame see the same grain.
+NOISE_TILE = 512
 
 
 def generate_blue_noise(batch_size, c, h, w, device, beta=1.5):
-    # Generate White Noise (Standard Gaussian)
-    white_noise = torch.randn((batch_size, c, h, w), device=device)
-    
-    # Convert to Frequency Domain (FFT)
-    fft_noise = torch.fft.fft2(white_noise)
-    
-    # Create Frequency Grid
-    y = torch.fft.fftfreq(h, device=device)
-    x = torch.fft.fftfreq(w, device=device)
-    dy, dx = torch.meshgrid(y, x, indexing='ij')
-    
-    # Calculate distance from center (frequency magnitude)
-    frequency_magnitude = torch.sqrt(dy**2 + dx**2)
-    
-    # Apply High-Pass Scaling: Amplitude ~ f^(beta/2)
-    scale = frequency_magnitude ** (beta / 2.0)
-    
-    # Zero out DC component
-    scale[0, 0] = 0 
-    
-    fft_structured = fft_noise * scale
-    
-    # Convert back to Spatial Domain (Inverse FFT)
-    blue_noise = torch.fft.ifft2(fft_structured).real
-    
-    # Normalize standard deviation to ~1.0
-    std = blue_noise.std()
+    """Blue noise from the shared noise engine, normalized to std ~1.0."""
+    noise = blue_noise(batch_size, c, h, w, device, beta=beta)
+    std = noise.std()
     if std > 1e-6:
-        blue_noise = blue_noise / std
-        
-    return blue_noise
+        noise = noise / std
+    return noise
+
 
+def periodic_noise_crop(noise_tile, y0, y1, x0, x1):
+    """Region [y0:y1, x0:x1] of the plane tiled with the periodic (B,C,n,n) noise_tile."""
+    n_h, n_w = noise_tile.shape[-2:]
+    ys = torch.arange(y0, y1, device=noise_tile.device) % n_h
+    xs = torch.arange(x0, x1, device=noise_tile.device) % n_w
+    return noise_tile.index_select(2, ys).index_select(3, xs)
 
-def _make_gaussian_kernel(kernel_size, sigma, device):
-    """Build a separable 2D Gaussian kernel tensor (1,1,k,k) on device."""
+
+@functools.lru_cache(maxsize=32)
+def _gaussian_kernels(kernel_size, sigma, channels, device, dtype):
+    """
+    Cached separable Gaussian as a pair of depthwise weights:
+    vertical (C,1,k,1) and horizontal (C,1,1,k). Built once per (size, sigma, C, device, dtype).
+    """
     k = kernel_size
-    coords = torch.arange(k, dtype=torch.float32, device=device) - k // 2
+    coords = torch.arange(k, dtype=torch.float32) - k // 2
     gauss_1d = torch.exp(-0.5 * (coords / sigma) ** 2)
-    gauss_1d = gauss_1d / gauss_1d.sum()
-    kernel_2d = gauss_1d[:, None] * gauss_1d[None, :]
-    return kernel_2d.view(1, 1, k, k)
+    gauss_1d = (gauss_1d / gauss_1d.sum()).to(device=device, dtype=dtype)
+    vertical = gauss_1d.view(1, 1, k, 1).repeat(channels, 1, 1, 1)
+    horizontal = gauss_1d.view(1, 1, 1, k).repeat(channels, 1, 1, 1)
+    return vertical, horizontal
 
 
 def fast_gaussian_blur_bchw(tensor_bchw, kernel_size=9, sigma=3.0):
     """
-    Fast per-channel GPU Gaussian blur via depthwise convolution.
-    Input/Output: BCHW float tensor. Kernel is always created on the same device.
+    Fast per-channel Gaussian blur: two 1D depthwise passes (2k taps instead of k²).
+    Zero padding, so the result equals the full 2D k x k convolution.
+    Input/Output: BCHW float tensor on any device.
     """
-    device = tensor_bchw.device
-    k = kernel_size
-    kernel = _make_gaussian_kernel(k, sigma, device)            # on same device
     C = tensor_bchw.shape[1]
-    kernel_c = kernel.expand(C, 1, k, k).to(device)            # guarantee same device
-    pad = k // 2
-    return F.conv2d(tensor_bchw.contiguous(), kernel_c, padding=pad, groups=C)
+    pad = kernel_size // 2
+    vertical, horizontal = _gaussian_kernels(kernel_size, sigma, C, tensor_bchw.device, tensor_bchw.dtype)
+    blurred = F.conv2d(tensor_bchw.contiguous(), vertical, padding=(pad, 0), groups=C)
+    return F.conv2d(blurred, horizontal, padding=(0, pad), groups=C)
+
+
+@torch.inference_mode()
+def frequency_split_bchw(sr_bchw, bicubic_bchw, kernel_size=9, sigma=3.0):
+    """
+    Fused frequency split: low frequencies from the bicubic image, high frequencies from SR.
+
+        blur(bicubic) + (sr - blur(sr))  ==  sr + blur(bicubic - sr)
+
+    (the blur is linear, zero padding included), so only the difference is blurred once
+    and added into sr in place, then clamped. sr_bchw is overwritten and returned.
+    """
+    diff = torch.sub(bicubic_bchw, sr_bchw)
+    diff = fast_gaussian_blur_bchw(diff, kernel_size, sigma)
+    return sr_bchw.add_(diff).clamp_(0.0, 1.0)
 
 
 def resize_bchw(tensor_bchw, target_h, target_w):
@@ -84,46 +100,82 @@ def resize_bchw(tensor_bchw, target_h, target_w):
 # tile       : starting tile size for tiled inference (OOM fallback halves it)
 # fp16_model : cast model weights to FP16 before inference (Tensor Core boost)
 # compile    : torch.compile mode — 'reduce-overhead' for fixed-shape tiling
+# batch      : max tiles stacked per forward pass (actual N is chosen from free memory)
 # ─────────────────────────────────────────────────────────────────────────────
 ARCH_PROFILES = {
     # ── Fast CNN / RRDB models — full FP16 support, large tiles ──────────────
-    "RRDBNet":      {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead"},  # ESRGAN, Real-ESRGAN
-    "SRVGGNetCompact": {"tile": 896, "fp16_model": True, "compile": "reduce-overhead"},  # Real-ESRGAN Compact
-    "SPAN":         {"tile": 896,  "fp16_model": True,  "compile": "reduce-overhead"},  # Swift, very fast
-    "PLKSR":        {"tile": 768,  "fp16_model": False, "compile": "reduce-overhead"},  # Lightweight
-    "RealPLKSR":    {"tile": 768,  "fp16_model": False, "compile": "reduce-overhead"},  # Lightweight photo
-    "RCAN":         {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead"},  # Residual channel attn
-    "SAFMN":        {"tile": 896,  "fp16_model": True,  "compile": "reduce-overhead"},  # Very fast
-    "DITN":         {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead"},
-    "CRAFT":        {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead"},
-    "NAFNet":       {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead"},
-    "OmniSR":       {"tile": 640,  "fp16_model": True,  "compile": "reduce-overhead"},
-    "RGT":          {"tile": 640,  "fp16_model": True,  "compile": "reduce-overhead"},
+    "RRDBNet":      {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 4},   # ESRGAN, Real-ESRGAN
+    "SRVGGNetCompact": {"tile": 896, "fp16_model": True, "compile": "reduce-overhead", "batch": 16},  # Real-ESRGAN Compact
+    "SPAN":         {"tile": 896,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 16},  # Swift, very fast
+    "PLKSR":        {"tile": 768,  "fp16_model": False, "compile": "reduce-overhead", "batch": 8},   # Lightweight
+    "RealPLKSR":    {"tile": 768,  "fp16_model": False, "compile": "reduce-overhead", "batch": 8},   # Lightweight photo
+    "RCAN":         {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 4},   # Residual channel attn
+    "SAFMN":        {"tile": 896,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 16},  # Very fast
+    "DITN":         {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 8},
+    "CRAFT":        {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 4},
+    "NAFNet":       {"tile": 768,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 8},
+    "OmniSR":       {"tile": 640,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 4},
+    "RGT":          {"tile": 640,  "fp16_model": True,  "compile": "reduce-overhead", "batch": 2},
     # ── Transformer / attention models — autocast only, conservative tiles ────
-    "DAT":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},  # Dual Attention Transformer
-    "DAT_S":        {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
-    "HAT":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},  # Hybrid Attention
-    "HAT_L":        {"tile": 480,  "fp16_model": False, "compile": "reduce-overhead"},  # HAT Large — very heavy
-    "SwinIR":       {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},  # Swin Transformer IR
-    "Swin2SR":      {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
-    "SAN":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},  # Second-order Attn
-    "DRCT":         {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
-    "ATD":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
-    "GRL":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
-    "FDAT":         {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
-    "AuraSR":       {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead"},
+    "DAT":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},   # Dual Attention Transformer
+    "DAT_S":        {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
+    "HAT":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},   # Hybrid Attention
+    "HAT_L":        {"tile": 480,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},   # HAT Large — very heavy
+    "SwinIR":       {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},   # Swin Transformer IR
+    "Swin2SR":      {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
+    "SAN":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},   # Second-order Attn
+    "DRCT":         {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
+    "ATD":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
+    "GRL":          {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
+    "FDAT":         {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
+    "AuraSR":       {"tile": 512,  "fp16_model": False, "compile": "reduce-overhead", "batch": 1},
 }
 
 # Fallback profile for any architecture not listed above.
 # Uses supports_half from spandrel for fp16_model, 512 tile as safe default.
-_DEFAULT_PROFILE = {"tile": 512, "fp16_model": None, "compile": "reduce-overhead"}
+_DEFAULT_PROFILE = {"tile": 512, "fp16_model": None, "compile": "reduce-overhead", "batch": 1}
 
 
-class Upscale_Machine:
-    # Session-level cache: model object id -> torch.compile'd inner module
-    # Avoids recompiling the same model on repeated runs in the same session.
-    _compiled_cache: dict = {}
+# ─────────────────────────────────────────────────────────────────────────────
+# CPU execution profiles (used when ComfyUI runs on CPU or execution="cpu").
+# Tiles are sized for L2/L3 cache and thread-pool parallelism, not VRAM.
+#
+# tile : tile size per worker thread
+# bf16 : allow bfloat16 autocast when the CPU has native BF16 (AVX512-BF16 / AMX)
+# ─────────────────────────────────────────────────────────────────────────────
+CPU_ARCH_PROFILES = {
+    # ── CNN / RRDB models — small tiles keep activations cache-resident ──────
+    "RRDBNet":      {"tile": 256, "bf16": True},
+    "SRVGGNetCompact": {"tile": 320, "bf16": True},
+    "SPAN":         {"tile": 320, "bf16": True},
+    "PLKSR":        {"tile": 256, "bf16": False},
+    "RealPLKSR":    {"tile": 256, "bf16": False},
+    "RCAN":         {"tile": 192, "bf16": True},
+    "SAFMN":        {"tile": 320, "bf16": True},
+    "DITN":         {"tile": 256, "bf16": True},
+    "CRAFT":        {"tile": 192, "bf16": True},
+    "NAFNet":       {"tile": 256, "bf16": True},
+    "OmniSR":       {"tile": 192, "bf16": True},
+    "RGT":          {"tile": 192, "bf16": True},
+    # ── Transformer / attention models — window-aligned, conservative ────────
+    "DAT":          {"tile": 192, "bf16": False},
+    "DAT_S":        {"tile": 192, "bf16": False},
+    "HAT":          {"tile": 192, "bf16": False},
+    "HAT_L":        {"tile": 128, "bf16": False},
+    "SwinIR":       {"tile": 192, "bf16": False},
+    "Swin2SR":      {"tile": 192, "bf16": False},
+    "SAN":          {"tile": 192, "bf16": False},
+    "DRCT":         {"tile": 192, "bf16": False},
+    "ATD":          {"tile": 192, "bf16": False},
+    "GRL":          {"tile": 192, "bf16": False},
+    "FDAT":         {"tile": 192, "bf16": False},
+    "AuraSR":       {"tile": 192, "bf16": False},
+}
+
+_DEFAULT_CPU_PROFILE = {"tile": 192, "bf16": False}
 
+
+class Upscale_Machine:
     @classmethod
     def INPUT_TYPES(cls):
         return {
@@ -133,6 +185,14 @@ class Upscale_Machine:
                 "chained_model": (["None"] + folder_paths.get_filename_list("upscale_models"), {"default": "None"}),
                 "rescale_factor": ("FLOAT", {"default": 2.0, "min": 0.01, "max": 16.0, "step": 0.01}),
                 "frequency_split": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "execution": (["auto", "cpu"], {"default": "auto",
+                                                "tooltip": "auto = ComfyUI's device; cpu = thread-pool tiles, channels_last, bf16 where supported"}),
+                "autotune": ("BOOLEAN", {"default": False,
+                                         "tooltip": "Benchmark tile sizes once per architecture/device/dtype and reuse the fastest"}),
+                "streaming": (["off", "device", "cpu", "pinned", "mmap"], {"default": "off",
+                                                                         "tooltip": "Run the whole pipeline tile by tile into one preallocated output buffer (constant peak memory)"}),
             }
         }
 
@@ -142,18 +202,20 @@ class Upscale_Machine:
     CATEGORY = "SATA_UtilityNode"
 
     def load_model(self, model_name):
-        """Load ESRGAN/RealESRGAN/AESRGAN from the project's upscale_models folder."""
+        """Load ESRGAN/RealESRGAN/AESRGAN from the project's upscale_models folder (cached)."""
         if not model_name:
             raise ValueError("No upscale model selected or provided.")
 
         model_path = folder_paths.get_full_path("upscale_models", model_name)
-        model_loader = ModelLoader()
-        model = model_loader.load_from_file(model_path)
+        if model_path is None:
+            raise FileNotFoundError(f"Upscale model not found: {model_name}")
+
+        # Deserialized once per process and reused while the file is unchanged
+        model = MODEL_CACHE.get(model_path)
 
         if model is None:
             raise RuntimeError(f"Failed to load upscale model: {model_name}")
 
-        model.eval()
         return model
 
     def _get_arch_profile(self, upscale_model):
@@ -171,104 +233,246 @@ class Upscale_Machine:
             profile = {**_DEFAULT_PROFILE, "fp16_model": fp16_ok}
         return inner_cls, profile
 
-    def _get_compiled_model(self, upscale_model, compile_mode):
+    def _get_compiled_model(self, upscale_model, compile_mode, dtype, tile_shape, device):
         """
         Returns a torch.compile()'d version of the model's inner nn.Module.
-        Cached by object id — compiles once per session per loaded model.
+        Cached by (architecture, weight hash, dtype, tile shape, device) — compiles once
+        per node lifetime even when the model is reloaded from disk.
         Falls back silently to eager mode if compile fails or Triton is missing.
         """
-        inner = upscale_model.model
-        cache_key = id(inner)
-        if cache_key not in Upscale_Machine._compiled_cache:
-            # Check for triton before attempting compile, as torch.compile is lazy
-            # and will otherwise crash on the first tile execution on Windows.
-            try:
-                import triton
-                has_triton = True
-            except ImportError:
-                has_triton = False
-
-            if has_triton:
-                try:
-                    compiled = torch.compile(inner, mode=compile_mode, dynamic=False)
-                    Upscale_Machine._compiled_cache[cache_key] = compiled
-                except Exception as ex:
-                    print(f"[Upscale_Machine] torch.compile unavailable ({ex}), using eager mode.")
-                    Upscale_Machine._compiled_cache[cache_key] = inner
-            else:
-                print("[Upscale_Machine] Triton not installed (Windows), skipping torch.compile.")
-                Upscale_Machine._compiled_cache[cache_key] = inner
-                
-        return Upscale_Machine._compiled_cache[cache_key]
-
-    def upscale_with_model(self, upscale_model, image_bchw, device, pbar=None):
+        return COMPILED_CACHE.get(upscale_model, compile_mode, dtype, tile_shape, device)
+
+    def upscale_with_model(self, upscale_model, image_bchw, device, pbar=None, autotune=False):
         """
         Architecture-aware tiled upscale:
           - Detects model type and loads optimisation profile
           - FP16 weights (Tensor Cores) for CNN models that support it
           - torch.autocast for mixed-precision on every tile (all architectures)
           - torch.compile fused graph (cached per session, falls back safely)
+          - N tiles stacked per forward pass, N chosen from free device memory
+          - tile size from the persisted autotune profile when one exists
         Input:  image_bchw -> (B,C,H,W) float32 [0,1]
         Output: (B,C,H',W') float32 [0,1]
         """
+        with self.prepared_model(upscale_model, device, autotune=autotune) as run:
+            return run(image_bchw, pbar=pbar)
+
+    def prepared_model(self, upscale_model, device, autotune=False, compile=True):
+        """
+        Context manager that moves/casts the model once and yields run(image_bchw, pbar=None).
+        The model is restored to FP32 on CPU on exit, so callers that upscale many crops
+        (streaming mode) pay the transfer once instead of once per crop. compile=False runs
+        the eager module — for inputs of varying shape, which would each compile a new graph.
+        """
+        if torch.device(device).type == "cpu":
+            return self._prepared_cpu(upscale_model, autotune=autotune)
+        return self._prepared_gpu(upscale_model, device, autotune=autotune, compile=compile)
+
+    @contextlib.contextmanager
+    def _prepared_gpu(self, upscale_model, device, autotune=False, compile=True):
         arch_name, profile = self._get_arch_profile(upscale_model)
         spandrel_supports_half = getattr(upscale_model, "supports_half", False)
         use_fp16   = profile["fp16_model"] and spandrel_supports_half
-        tile       = profile["tile"]
+        dtype      = torch.float16 if use_fp16 else torch.float32
+        tile       = resolve_tile(arch_name, device, dtype, profile["tile"])
         comp_mode  = profile["compile"]
         device_type = device.type if hasattr(device, "type") else str(device).split(":")[0]
+        scale      = getattr(upscale_model, "scale", 4)
+        overlap    = 32
 
-        print(f"[Upscale_Machine] {arch_name} | "
-              f"tile={tile} | fp16={'yes' if use_fp16 else 'no'} | compile={comp_mode}")
+        # If model doesn't support fp16 (like DAT/HAT), autocast to fp16 will also cause NaNs.
+        # We only autocast if use_fp16 is True to be perfectly safe.
+        make_ctx = lambda: torch.autocast(device_type=device_type, dtype=torch.float16) if use_fp16 else contextlib.nullcontext()
 
-        upscale_model.to(device)
+        # Compiled graphs wrap one canonical module per weight hash — move/cast that one
+        inner = COMPILED_CACHE.canonical_module(upscale_model)
+        inner.to(device)
         if use_fp16:
-            upscale_model.half()
-            in_tensor = image_bchw.to(device).half()
-        else:
-            in_tensor = image_bchw.to(device).float()
+            inner.half()
 
-        # Compile inner nn.Module once per session
-        compiled_fn = self._get_compiled_model(upscale_model, comp_mode)
+        try:
+            if autotune and "tile" not in (get_profile(arch_name, device, dtype) or {}):
+                tile = autotune_tiles(inner, arch_name, device, dtype, scale, overlap=overlap,
+                                      max_batch=profile["batch"], make_context=make_ctx)
+
+            print(f"[Upscale_Machine] {arch_name} | "
+                  f"tile={tile} | batch<={profile['batch']} | fp16={'yes' if use_fp16 else 'no'} | "
+                  f"compile={comp_mode if compile else 'off'}")
+
+            # OOM back-off is remembered across calls within this context
+            state = {"tile": tile}
+
+            def run(image_bchw, pbar=None):
+                in_tensor = image_bchw.to(device, dtype=dtype)
+                # Large outputs are blended on the CPU, like comfy.utils.tiled_scale did
+                B, C, H, W = in_tensor.shape
+                output_device = accumulation_device(device, B, C, H * scale, W * scale)
+                while True:
+                    tile = state["tile"]
+                    try:
+                        th, tw, ys, xs = tile_grid(in_tensor.shape[2], in_tensor.shape[3], tile, overlap)
+                        n_tiles = choose_tiles_per_batch(device, th, tw, scale,
+                                                         element_size=in_tensor.element_size(),
+                                                         max_batch=profile["batch"])
+                        compiled_fn = self._get_compiled_model(upscale_model, comp_mode, in_tensor.dtype,
+                                                               (n_tiles, th, tw), device) if compile else inner
+
+                        local_pbar = pbar or comfy.utils.ProgressBar(in_tensor.shape[0] * len(ys) * len(xs))
+
+                        # N fixed-shape tiles per forward pass, feathered blend, OOM halves N first
+                        with make_ctx():
+                            s = batched_tiled_scale(
+                                in_tensor,
+                                compiled_fn,
+                                tile=tile,
+                                overlap=overlap,
+                                scale=scale,
+                                tiles_per_batch=n_tiles,
+                                pad_batches=compiled_fn is not inner,
+                                output_device=output_device,
+                                pbar=local_pbar
+                            )
+                        return torch.clamp(s.float(), min=0.0, max=1.0)
+                    except model_management.OOM_EXCEPTION as e:
+                        model_management.soft_empty_cache()
+                        # Persist the ceiling so the next job doesn't hit the same OOM
+                        record_oom(arch_name, device, dtype, tile)
+                        state["tile"] = tile // 2
+                        if state["tile"] < 128:
+                            raise e
+
+            yield run
+        finally:
+            inner.cpu().float()   # Always restore to FP32 on CPU
 
+    @contextlib.contextmanager
+    def _prepared_cpu(self, upscale_model, autotune=False):
+        """
+        CPU execution mode:
+          - CPU_ARCH_PROFILES tile sizes instead of the VRAM-tuned ones
+          - independent tiles run concurrently on a thread pool, each worker with its
+            own intra-op thread count (workers x threads ≈ cores)
+          - channels_last weights and inputs (oneDNN's preferred conv layout)
+          - bfloat16 autocast when the CPU has native BF16 and the architecture allows it
+        """
+        inner = upscale_model.model
+        arch_name = type(inner).__name__
+        profile = CPU_ARCH_PROFILES.get(arch_name, _DEFAULT_CPU_PROFILE)
+        use_bf16 = profile["bf16"] and cpu_supports_bf16()
+        workers, intra_threads = cpu_thread_layout()
+        scale = getattr(upscale_model, "scale", 4)
+        overlap = 16
+        dtype = torch.bfloat16 if use_bf16 else torch.float32
+        tile = resolve_tile(arch_name, "cpu", dtype, profile["tile"])
+
+        def run_tiles(batch):
+            batch = batch.contiguous(memory_format=torch.channels_last)
+            if use_bf16:
+                with torch.autocast(device_type="cpu", dtype=torch.bfloat16):
+                    return inner(batch).float()
+            return inner(batch)
+
+        inner.cpu().float().to(memory_format=torch.channels_last)
         try:
-            overlap = 32
-            oom = True
-            while oom:
-                try:
-                    if not pbar:
-                        steps = in_tensor.shape[0] * comfy.utils.get_tiled_scale_steps(
-                            in_tensor.shape[3], in_tensor.shape[2], tile_x=tile, tile_y=tile, overlap=overlap
-                        )
-                        local_pbar = comfy.utils.ProgressBar(steps)
-                    else:
-                        local_pbar = pbar
-
-                    import contextlib
-                    # If model doesn't support fp16 (like DAT/HAT), autocast to fp16 will also cause NaNs.
-                    # We only autocast if use_fp16 is True to be perfectly safe.
-                    ctx = torch.autocast(device_type=device_type, dtype=torch.float16) if use_fp16 else contextlib.nullcontext()
-                    
-                    with ctx:
-                        s = comfy.utils.tiled_scale(
-                            in_tensor,
-                            lambda a: compiled_fn(a),
-                            tile_x=tile,
-                            tile_y=tile,
-                            overlap=overlap,
-                            upscale_amount=getattr(upscale_model, "scale", 4),
-                            pbar=local_pbar
-                        )
-                    oom = False
-                except model_management.OOM_EXCEPTION as e:
-                    model_management.soft_empty_cache()
-                    tile //= 2
-                    if tile < 128:
-                        raise e
+            executor = cpu_tile_executor(workers, intra_threads) if workers > 1 else None
+
+            # Timed through the same executor, so the profile reflects workers x threads
+            if autotune and "tile" not in (get_profile(arch_name, "cpu", dtype) or {}):
+                tile = autotune_tiles(run_tiles, arch_name, "cpu", dtype, scale, overlap=overlap,
+                                      max_tile=2 * profile["tile"], input_dtype=torch.float32,
+                                      executor=executor)
+
+            print(f"[Upscale_Machine] {arch_name} | cpu | tile={tile} | workers={workers}x{intra_threads} threads | "
+                  f"bf16={'yes' if use_bf16 else 'no'}")
+
+            def run(image_bchw, pbar=None):
+                in_tensor = image_bchw.cpu().float()
+                if not pbar:
+                    _, _, ys, xs = tile_grid(in_tensor.shape[2], in_tensor.shape[3], tile, overlap)
+                    pbar = comfy.utils.ProgressBar(in_tensor.shape[0] * len(ys) * len(xs))
+                s = batched_tiled_scale(
+                    in_tensor,
+                    run_tiles,
+                    tile=tile,
+                    overlap=overlap,
+                    scale=scale,
+                    tiles_per_batch=1,
+                    pbar=pbar,
+                    executor=executor,
+                )
+                return torch.clamp(s, min=0.0, max=1.0)
+
+            yield run
         finally:
-            upscale_model.cpu().float()   # Always restore to FP32 on CPU
+            inner.to(memory_format=torch.contiguous_format)
 
-        return torch.clamp(s.float(), min=0.0, max=1.0)
+    def upscale_streaming(self, image_bchw, up_model, chain_model, target_h, target_w, frequency_split,
+                          device, buffer="cpu", autotune=False):
+        """
+        Streaming pipeline — never materialises a full-resolution intermediate:
+          - the final image is produced in STREAM_TILE output tiles
+          - for each tile, the crop every stage needs (model halo, resampling taps, blur
+            radius) is derived backwards, then model 1 -> resize -> model 2 -> resize ->
+            frequency split -> blue noise run forward on crops only
+          - results are written straight into one preallocated BHWC output buffer
+            (device / cpu / pinned / mmap)
+        Peak memory is bounded by one tile's crops regardless of output size. Crops come in
+        many shapes (image edges, halos), so the models run eager instead of compiled. The
+        chained-model blue noise is cropped from the periodic NOISE_TILE, as in the regular
+        path.
+        Input:  image_bchw -> (B,3,H,W) float32 [0,1] on device
+        Output: (B,target_h,target_w,3) float32 [0,1]
+        """
+        B, C, H, W = image_bchw.shape
+        target = (target_h, target_w)
+        counter = _TileCounter()
+        blur_margin = 9 // 2     # fast_gaussian_blur_bchw kernel radius
+
+        out = allocate_output((B, target_h, target_w, C), buffer, device)
+        noise_tile = generate_blue_noise(B, C, NOISE_TILE, NOISE_TILE, device) if chain_model is not None else None
+
+        with contextlib.ExitStack() as stack:
+            stages = []
+            h, w = H, W
+            for model in (up_model, chain_model):
+                if model is None:
+                    continue
+                run = stack.enter_context(self.prepared_model(model, device, autotune=autotune, compile=False))
+                scale = getattr(model, "scale", 4)
+                stages.append(ModelStage(lambda crop, run=run: run(crop, pbar=counter).to(device), scale, h, w))
+                stages.append(ResizeStage(h * scale, w * scale, target_h, target_w))
+                h, w = target_h, target_w
+            bicubic = [ResizeStage(H, W, target_h, target_w)]
+            if not stages:
+                stages = bicubic
+
+            regions = [((y, min(y + STREAM_TILE, target_h)), (x, min(x + STREAM_TILE, target_w)))
+                       for y in range(0, target_h, STREAM_TILE) for x in range(0, target_w, STREAM_TILE)]
+            pbar = comfy.utils.ProgressBar(len(regions))
+
+            for region in regions:
+                (y0, y1), (x0, x1) = region
+                if frequency_split and up_model is not None:
+                    # Blur needs a radius of context; crops at image edges keep zero padding
+                    wide = expand_region(region, blur_margin, target)
+                    sr = pull_region(stages, image_bchw, wide)
+                    bic = pull_region(bicubic, image_bchw, wide)
+                    tile = frequency_split_bchw(sr, bic)
+                    oy, ox = y0 - wide[0][0], x0 - wide[1][0]
+                    tile = tile[:, :, oy:oy + y1 - y0, ox:ox + x1 - x0]
+                else:
+                    tile = pull_region(stages, image_bchw, region)
+
+                if noise_tile is not None:
+                    noise = periodic_noise_crop(noise_tile, y0, y1, x0, x1).to(tile.device)
+                    tile = torch.clamp(tile + noise * 0.15, 0.0, 1.0)
+
+                out[:, y0:y1, x0:x1, :].copy_(tile.movedim(1, -1), non_blocking=out.is_pinned())
+                pbar.update(1)
+
+            if out.is_pinned():
+                torch.cuda.synchronize()
+        return out
 
     def _round_to_modulus(self, value, modulus):
         if modulus is None or modulus <= 1:
@@ -276,12 +480,15 @@ class Upscale_Machine:
         return max(modulus, int(round(value / modulus)) * modulus)
 
     def upscale(self, image, upscale_model, chained_model="None", rounding_modulus=8, supersample='true',
-                rescale_factor=2.0, frequency_split=True):
+                rescale_factor=2.0, frequency_split=True, execution="auto", autotune=False, streaming="off"):
 
         if image.ndim != 4:
             raise ValueError("Expected IMAGE tensor with 4 dims (B,H,W,C).")
 
-        device = model_management.get_torch_device()
+        if execution == "cpu":
+            device = torch.device("cpu")
+        else:
+            device = model_management.get_torch_device()
 
         original_height = int(image.shape[1])
         original_width = int(image.shape[2])
@@ -295,23 +502,32 @@ class Upscale_Machine:
         elif current_bchw.shape[1] > 3:
             current_bchw = current_bchw[:, :3, :, :]
 
+        has_chain = chained_model and chained_model != "None"
+        if streaming != "off":
+            images_out = self.upscale_streaming(
+                current_bchw,
+                self.load_model(upscale_model) if upscale_model else None,
+                self.load_model(chained_model) if has_chain else None,
+                target_h, target_w, frequency_split, device, buffer=streaming, autotune=autotune,
+            )
+            return (images_out,)
+
         # Keep a clean GPU copy of original for frequency split baseline
         original_bchw = current_bchw.clone()
 
         # ── First upscale model ───────────────────────────────────────────────
         if upscale_model:
             up_model = self.load_model(upscale_model)
-            current_bchw = self.upscale_with_model(up_model, current_bchw, device)
-            # tiled_scale may return CPU tensor — pin back to GPU
+            current_bchw = self.upscale_with_model(up_model, current_bchw, device, autotune=autotune)
+            # no-op when the tile engine already accumulated on the device
             current_bchw = current_bchw.to(device)
             current_bchw = resize_bchw(current_bchw, target_h, target_w)
 
         # ── Chained model ─────────────────────────────────────────────────────
-        has_chain = chained_model and chained_model != "None"
         if has_chain:
             chain_model = self.load_model(chained_model)
-            current_bchw = self.upscale_with_model(chain_model, current_bchw, device)
-            # tiled_scale may return CPU tensor — pin back to GPU
+            current_bchw = self.upscale_with_model(chain_model, current_bchw, device, autotune=autotune)
+            # no-op when the tile engine already accumulated on the device
             current_bchw = current_bchw.to(device)
             current_bchw = resize_bchw(current_bchw, target_h, target_w)
 
@@ -323,18 +539,14 @@ class Upscale_Machine:
             bicubic_bchw = resize_bchw(original_bchw.to(device), target_h, target_w)
             images_out = images_out.to(device)
 
-            sr_low  = fast_gaussian_blur_bchw(images_out)
-            sr_high = images_out - sr_low
-
-            bic_low = fast_gaussian_blur_bchw(bicubic_bchw)
-            images_out = torch.clamp(bic_low + sr_high, 0.0, 1.0)
+            images_out = frequency_split_bchw(images_out, bicubic_bchw)
 
         # ── Blue Noise realism (chained only) ─────────────────────────────────
         if has_chain:
             images_out = images_out.to(device)
             B, C, H, W = images_out.shape
-            noise = generate_blue_noise(B, C, H, W, device)
-            images_out = torch.clamp(images_out + noise * 0.15, 0.0, 1.0)
+            noise_tile = generate_blue_noise(B, C, NOISE_TILE, NOISE_TILE, device)
+            images_out = torch.clamp(images_out + periodic_noise_crop(noise_tile, 0, H, 0, W) * 0.15, 0.0, 1.0)
 
         # Convert back to BHWC for ComfyUI
         return (images_out.movedim(1, -1).contiguous(),)
\ No newline at end of file
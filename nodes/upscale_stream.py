@@ -0,0 +1,143 @@
+import math
+import os
+import tempfile
+
+import torch
+import torch.nn.functional as F
+
+NODE_NAME = "Upscale_Machine"
+
+# Edge length (in final output pixels) of one streamed output tile.
+STREAM_TILE = 512
+# Context added around every model crop (model input pixels) so crop borders
+# don't show convolution padding artefacts in the kept interior.
+MODEL_HALO = 32
+# Taps needed on each side by bicubic/bilinear resampling.
+_RESAMPLE_HALO = 2
+
+
+def _clamp_range(lo, hi, size):
+    return max(0, lo), min(size, hi)
+
+
+class ModelStage:
+    """Model upscale of a crop: output region -> input region with MODEL_HALO context."""
+
+    def __init__(self, run, scale, in_h, in_w, halo=MODEL_HALO):
+        self.run = run
+        self.scale = scale
+        self.in_size = (in_h, in_w)
+        self.out_size = (in_h * scale, in_w * scale)
+        self.halo = halo
+
+    def needed(self, region):
+        (y0, y1), (x0, x1) = region
+        s, h = self.scale, self.halo
+        return (_clamp_range(y0 // s - h, -(-y1 // s) + h, self.in_size[0]),
+                _clamp_range(x0 // s - h, -(-x1 // s) + h, self.in_size[1]))
+
+    def compute(self, crop, crop_region, region):
+        s = self.scale
+        result = self.run(crop)
+        oy = region[0][0] - crop_region[0][0] * s
+        ox = region[1][0] - crop_region[1][0] * s
+        return result[:, :, oy:oy + region[0][1] - region[0][0], ox:ox + region[1][1] - region[1][0]]
+
+
+class ResizeStage:
+    """
+    resize_bchw of a crop. Sampling positions are computed in full-image coordinates and
+    evaluated with grid_sample, so every crop reproduces exactly the pixels F.interpolate
+    would produce on the whole image (border padding == interpolate's index clamping).
+    """
+
+    def __init__(self, in_h, in_w, out_h, out_w):
+        self.in_size = (in_h, in_w)
+        self.out_size = (out_h, out_w)
+        self.identity = (in_h, in_w) == (out_h, out_w)
+        downscaling = out_h < in_h or out_w < in_w
+        self.mode = "bilinear" if downscaling else "bicubic"
+
+    def _source_coords(self, lo, hi, dim):
+        ratio = self.in_size[dim] / self.out_size[dim]
+        return (torch.arange(lo, hi, dtype=torch.float64) + 0.5) * ratio - 0.5
+
+    def needed(self, region):
+        if self.identity:
+            return region
+        out = []
+        for dim, (lo, hi) in enumerate(region):
+            coords = self._source_coords(lo, hi, dim)
+            first = math.floor(coords[0].item()) - _RESAMPLE_HALO + 1
+            last = math.floor(coords[-1].item()) + _RESAMPLE_HALO + 1
+            out.append(_clamp_range(first, last, self.in_size[dim]))
+        return tuple(out)
+
+    def compute(self, crop, crop_region, region):
+        if self.identity:
+            (cy0, _), (cx0, _) = crop_region
+            (y0, y1), (x0, x1) = region
+            return crop[:, :, y0 - cy0:y1 - cy0, x0 - cx0:x1 - cx0]
+        crop_h, crop_w = crop.shape[2], crop.shape[3]
+        ys = self._source_coords(*region[0], 0) - crop_region[0][0]
+        xs = self._source_coords(*region[1], 1) - crop_region[1][0]
+        # pixel-centre coordinates -> [-1, 1] for align_corners=False
+        gy = (2.0 * ys + 1.0) / crop_h - 1.0
+        gx = (2.0 * xs + 1.0) / crop_w - 1.0
+        grid = torch.stack(torch.meshgrid(gy, gx, indexing="ij")[::-1], dim=-1)
+        grid = grid.to(crop.device, crop.dtype).unsqueeze(0).expand(crop.shape[0], -1, -1, -1)
+        return F.grid_sample(crop, grid, mode=self.mode, padding_mode="border", align_corners=False)
+
+
+def pull_region(stages, source, region):
+    """
+    Evaluate a chain of stages for one output region.
+    Walks the chain backwards to find the input crop each stage needs, then runs forward.
+    """
+    regions = [region]
+    for stage in reversed(stages):
+        regions.insert(0, stage.needed(regions[0]))
+    (y0, y1), (x0, x1) = regions[0]
+    x = source[:, :, y0:y1, x0:x1]
+    for stage, crop_region, out_region in zip(stages, regions, regions[1:]):
+        x = stage.compute(x, crop_region, out_region)
+    return x
+
+
+def expand_region(region, margin, size):
+    return tuple(_clamp_range(lo - margin, hi + margin, n) for (lo, hi), n in zip(region, size))
+
+
+def allocate_output(shape, buffer, device):
+    """
+    Preallocate the final BHWC float32 output.
+      device : on the compute device
+      cpu    : regular host memory
+      pinned : page-locked host memory (async device->host copies), cpu if CUDA is absent
+      mmap   : file-backed tensor in the ComfyUI temp directory (unlinked once mapped)
+    """
+    if buffer == "device":
+        return torch.empty(shape, dtype=torch.float32, device=device)
+    if buffer == "pinned" and torch.cuda.is_available():
+        return torch.empty(shape, dtype=torch.float32, pin_memory=True)
+    if buffer == "mmap":
+        import folder_paths
+        temp_dir = folder_paths.get_temp_directory()
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="sata_upscale_", suffix=".f32", dir=temp_dir)
+        os.close(fd)
+        numel = math.prod(shape)
+        out = torch.from_file(path, shared=True, size=numel, dtype=torch.float32).view(shape)
+        try:
+            os.unlink(path)     # mapping stays valid on POSIX; Windows keeps it until exit
+        except OSError:
+            pass
+        return out
+    return torch.empty(shape, dtype=torch.float32)
+
+
+class _TileCounter:
+    """Swallows per-crop progress updates from the tile engine."""
+
+    def update(self, n):
+        pass
@@ -0,0 +1,250 @@
+import collections
+import functools
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from comfy import model_management
+
+NODE_NAME = "Upscale_Machine"
+
+# Upper bound on tiles stacked into one forward pass, and the share of free
+# device memory the batch is allowed to claim when choosing N.
+MAX_TILES_PER_BATCH = 16
+BATCH_MEMORY_FRACTION = 0.5
+# Share of free device memory the full-resolution float32 output + blend weights
+# may take before they are accumulated on the CPU instead (as tiled_scale does).
+ACCUMULATOR_MEMORY_FRACTION = 0.25
+
+# Rough activation footprint per input pixel of a tile for SR CNNs:
+# ~64 feature channels with a few live tensors, plus scale² output pixels.
+_FEATURE_CHANNELS = 64
+_LIVE_FEATURE_MAPS = 4
+
+
+def fit_tile(size, tile, overlap, multiple=8):
+    """
+    Smallest tile edge (<= tile, multiple of `multiple`) that covers `size` with the same
+    number of tiles as `tile` would. Spreads the leftover evenly instead of running a
+    nearly-empty extra tile at the edge.
+    """
+    if size <= tile:
+        return size
+    count = math.ceil((size - overlap) / (tile - overlap))
+    fitted = math.ceil((size - overlap) / count) + overlap
+    fitted = math.ceil(fitted / multiple) * multiple
+    return min(tile, fitted)
+
+
+def tile_positions(size, tile, overlap):
+    """
+    Start offsets of fixed-size tiles covering [0, size).
+    The last tile is shifted back to end exactly at `size`, so every tile has the same
+    shape (no ragged edge tiles — keeps torch.compile(dynamic=False) on one graph).
+    """
+    if size <= tile:
+        return [0]
+    stride = max(1, tile - overlap)
+    positions = list(range(0, size - tile, stride))
+    positions.append(size - tile)
+    return positions
+
+
+def tile_grid(height, width, tile, overlap):
+    """Return (tile_h, tile_w, y positions, x positions) for an image of height x width."""
+    th = fit_tile(height, tile, overlap)
+    tw = fit_tile(width, tile, overlap)
+    return th, tw, tile_positions(height, th, overlap), tile_positions(width, tw, overlap)
+
+
+@functools.lru_cache(maxsize=16)
+def _feather_mask(out_h, out_w, feather, device, dtype):
+    """(1,1,h,w) linear-ramp blend mask — same weighting as comfy.utils.tiled_scale."""
+    mask = torch.ones((1, 1, out_h, out_w), device=device, dtype=dtype)
+    for dim, length in ((2, out_h), (3, out_w)):
+        f = min(feather, length // 2)
+        for t in range(f):
+            a = (t + 1) / f
+            mask.narrow(dim, t, 1).mul_(a)
+            mask.narrow(dim, length - 1 - t, 1).mul_(a)
+    return mask
+
+
+def estimate_tile_bytes(tile_h, tile_w, scale, channels=3, element_size=2):
+    """Approximate peak memory (bytes) of one tile in a forward pass."""
+    pixels = tile_h * tile_w
+    per_pixel = _FEATURE_CHANNELS * _LIVE_FEATURE_MAPS + channels * (1 + 2 * scale * scale)
+    return pixels * per_pixel * element_size
+
+
+def choose_tiles_per_batch(device, tile_h, tile_w, scale, element_size=2, max_batch=MAX_TILES_PER_BATCH):
+    """Pick N (tiles per forward) from the device's currently free memory."""
+    if max_batch <= 1:
+        return 1
+    try:
+        free = model_management.get_free_memory(device)
+    except Exception:
+        return 1
+    per_tile = estimate_tile_bytes(tile_h, tile_w, scale, element_size=element_size)
+    n = int(free * BATCH_MEMORY_FRACTION // max(1, per_tile))
+    return max(1, min(max_batch, n))
+
+
+def accumulation_device(device, batch, channels, height, width):
+    """
+    Where to blend a (batch, channels, height, width) float32 output: the compute
+    device while output + weights fit in ACCUMULATOR_MEMORY_FRACTION of its free
+    memory, otherwise the CPU.
+    """
+    device = torch.device(device)
+    if device.type == "cpu":
+        return device
+    needed = (batch * channels + 1) * height * width * 4
+    try:
+        free = model_management.get_free_memory(device)
+    except Exception:
+        return torch.device("cpu")
+    return device if needed <= free * ACCUMULATOR_MEMORY_FRACTION else torch.device("cpu")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CPU execution helpers.
+#
+# Tiles are independent, so on CPU they run concurrently on a small thread pool.
+# Each worker gets its own intra-op thread count (OpenMP/oneDNN settings are per
+# calling thread), so workers x intra-op threads stays at the physical core count
+# instead of every tile fighting over one oversubscribed pool.
+# ─────────────────────────────────────────────────────────────────────────────
+CPU_MAX_WORKERS = 4
+CPU_MIN_THREADS_PER_WORKER = 2
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def cpu_thread_layout(cores=None):
+    """Return (workers, intra-op threads per worker) for this machine."""
+    cores = cores or torch.get_num_threads() or os.cpu_count() or 1
+    workers = max(1, min(CPU_MAX_WORKERS, cores // CPU_MIN_THREADS_PER_WORKER))
+    return workers, max(1, cores // workers)
+
+
+def cpu_tile_executor(workers, intra_threads):
+    """Shared ThreadPoolExecutor whose threads run torch with `intra_threads` each."""
+    key = (workers, intra_threads)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sata_upscale_tile",
+                                          initializer=torch.set_num_threads, initargs=(intra_threads,))
+            _executors[key] = executor
+    return executor
+
+
+@functools.lru_cache(maxsize=None)
+def cpu_supports_bf16():
+    """True when oneDNN can run bfloat16 natively (AVX512-BF16 or AMX)."""
+    if not torch.backends.mkldnn.is_available():
+        return False
+    for probe in ("_is_amx_tile_supported", "_is_avx512_bf16_supported"):
+        fn = getattr(torch.cpu, probe, None)
+        try:
+            if fn is not None and fn():
+                return True
+        except Exception:
+            pass
+    return False
+
+
+@torch.inference_mode()
+def batched_tiled_scale(image_bchw, function, tile, overlap, scale, tiles_per_batch=1,
+                        pad_batches=False, output_device=None, pbar=None, executor=None):
+    """
+    Tiled upscale that runs N fixed-shape tiles per forward pass.
+
+      - image is cut into equal crops no larger than (tile x tile), edge tiles shifted
+        inwards (never ragged)
+      - N crops are stacked into one (N,C,th,tw) batch; with pad_batches the last batch is
+        padded by repeating its final crop so the batch shape never changes either
+        (wanted for compiled graphs, wasted work in eager mode)
+      - outputs are blended with a feathered overlap mask (same ramp as tiled_scale)
+      - on OOM the batch size is halved and the failed batch retried; at N=1 the OOM
+        is re-raised so the caller can shrink the tile
+      - with an executor, batches run concurrently on its threads (CPU mode); blending
+        stays on the calling thread in tile order. Autocast and inference mode are
+        thread-local, so `function` must enter its own autocast context if it needs one
+
+    Input:  (B,C,H,W) tensor on the compute device
+    Output: (B,C_out,H*scale,W*scale) tensor on output_device (defaults to input device)
+    """
+    B, _, H, W = image_bchw.shape
+    th, tw, ys, xs = tile_grid(H, W, tile, overlap)
+    coords = [(b, y, x) for b in range(B) for y in ys for x in xs]
+    output_device = output_device or image_bchw.device
+
+    oh, ow = th * scale, tw * scale
+    mask = _feather_mask(oh, ow, overlap * scale, output_device, torch.float32)
+
+    # Blend weights depend only on tile positions — identical for every image
+    weight = torch.zeros((1, 1, H * scale, W * scale), device=output_device)
+    for y in ys:
+        for x in xs:
+            weight[:, :, y * scale:y * scale + oh, x * scale:x * scale + ow] += mask
+
+    out = None
+
+    def blend(group, result):
+        nonlocal out
+        result = result.to(output_device, dtype=torch.float32)
+        if out is None:
+            out = torch.zeros((B, result.shape[1], H * scale, W * scale), device=output_device)
+        for j, (b, y, x) in enumerate(group):
+            out[b, :, y * scale:y * scale + oh, x * scale:x * scale + ow].addcmul_(result[j], mask[0])
+        if pbar is not None:
+            pbar.update(len(group))
+
+    def make_batch(group, n):
+        crops = [image_bchw[b, :, y:y + th, x:x + tw] for b, y, x in group]
+        if pad_batches:
+            crops += [crops[-1]] * (n - len(crops))
+        return torch.stack(crops)
+
+    n = max(1, int(tiles_per_batch))
+
+    if executor is not None:
+        def run(batch):
+            with torch.inference_mode():
+                return function(batch)
+
+        # Bounded in-flight window keeps at most ~2 batches per worker resident
+        max_inflight = 2 * getattr(executor, "_max_workers", 1)
+        pending = collections.deque()
+        for i in range(0, len(coords), n):
+            group = coords[i:i + n]
+            pending.append((group, executor.submit(run, make_batch(group, n))))
+            if len(pending) >= max_inflight:
+                group, future = pending.popleft()
+                blend(group, future.result())
+        while pending:
+            group, future = pending.popleft()
+            blend(group, future.result())
+        return out.div_(weight)
+
+    i = 0
+    while i < len(coords):
+        group = coords[i:i + n]
+        try:
+            result = function(make_batch(group, n))
+        except model_management.OOM_EXCEPTION:
+            model_management.soft_empty_cache()
+            if n == 1:
+                raise
+            n //= 2
+            print(f"[{NODE_NAME}] OOM with batched tiles, retrying with {n} tiles per batch")
+            continue
+        blend(group, result)
+        i += len(group)
+
+    return out.div_(weight)
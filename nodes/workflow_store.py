@@ -0,0 +1,203 @@
+import copy
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NODE_NAME = "Save_Machine"
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Content-addressed workflow store (Save_Machine "sidecar" metadata mode)
+#
+# Thousands of images usually share one graph and differ only in their seeds,
+# so instead of embedding prompt + workflow JSON in every file:
+#   - per-image values (DELTA_FIELDS inputs, the canvas pan/zoom) are cut out
+#     and replaced by {"$delta": key} markers
+#   - the rest is hashed (sha256 of canonical JSON) and written once to
+#     <output>/.workflows/<sha256>.json.zst (.json.gz without zstandard)
+#   - images embed only WORKFLOW_REF_KEY: {"sha256", "file", "delta"}
+# WorkflowStore.load(ref) puts the deltas back and returns (prompt, extra_pnginfo).
+# ─────────────────────────────────────────────────────────────────────────────
+WORKFLOW_STORE_DIR = ".workflows"
+WORKFLOW_REF_KEY = "workflow_ref"
+DELTA_FIELDS = ("seed", "noise_seed")
+DELTA_WORKFLOW_EXTRA = ("ds",)          # canvas offset/zoom, changes whenever the graph is panned
+DELTA_MARKER = "$delta"
+ZSTD_LEVEL = 10
+
+STORE_SUFFIX = ".json.zst" if zstandard is not None else ".json.gz"
+
+
+def canonical_json(data):
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _marker(key):
+    return {DELTA_MARKER: key}
+
+
+def split_metadata(prompt=None, extra_pnginfo=None):
+    """
+    (shared, delta): shared = {"prompt", "extra_pnginfo"} with per-image values replaced by
+    markers (inputs are copied, never modified), delta = {key: value} for those values.
+    """
+    delta = {}
+    shared_prompt = prompt
+    if isinstance(prompt, dict):
+        shared_prompt = {}
+        for node_id, node in prompt.items():
+            inputs = node.get("inputs") if isinstance(node, dict) else None
+            if isinstance(inputs, dict) and any(f in inputs for f in DELTA_FIELDS):
+                node = dict(node, inputs=dict(inputs))
+                for field in DELTA_FIELDS:
+                    value = inputs.get(field)
+                    # Linked inputs are [node_id, slot] lists and belong to the graph
+                    if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+                        key = f"{node_id}/{field}"
+                        delta[key] = value
+                        node["inputs"][field] = _marker(key)
+            shared_prompt[node_id] = node
+
+    shared_extra = extra_pnginfo
+    workflow = extra_pnginfo.get("workflow") if isinstance(extra_pnginfo, dict) else None
+    if isinstance(workflow, dict):
+        workflow = dict(workflow)
+        by_node = {}
+        for key, value in delta.items():
+            node_id, _ = key.split("/", 1)
+            by_node.setdefault(node_id, []).append((key, value))
+        if by_node and isinstance(workflow.get("nodes"), list):
+            nodes = []
+            for node in workflow["nodes"]:
+                pending = by_node.get(str(node.get("id"))) if isinstance(node, dict) else None
+                widgets = node.get("widgets_values") if pending else None
+                if isinstance(widgets, list):
+                    widgets = list(widgets)
+                    for key, value in pending:
+                        # The widget holding the value: first entry equal to it
+                        for i, widget in enumerate(widgets):
+                            if type(widget) is type(value) and widget == value:
+                                widgets[i] = _marker(key)
+                                break
+                    node = dict(node, widgets_values=widgets)
+                nodes.append(node)
+            workflow["nodes"] = nodes
+        extra = workflow.get("extra")
+        if isinstance(extra, dict) and any(k in extra for k in DELTA_WORKFLOW_EXTRA):
+            extra = dict(extra)
+            for k in DELTA_WORKFLOW_EXTRA:
+                if k in extra:
+                    key = f"workflow.extra.{k}"
+                    delta[key] = extra[k]
+                    extra[k] = _marker(key)
+            workflow["extra"] = extra
+        shared_extra = dict(extra_pnginfo, workflow=workflow)
+
+    return {"prompt": shared_prompt, "extra_pnginfo": shared_extra}, delta
+
+
+def apply_delta(data, delta):
+    """Replace every {"$delta": key} marker in data with delta[key] (markers without a value stay)."""
+    if isinstance(data, dict):
+        if len(data) == 1 and DELTA_MARKER in data:
+            return copy.deepcopy(delta.get(data[DELTA_MARKER], data))
+        return {k: apply_delta(v, delta) for k, v in data.items()}
+    if isinstance(data, list):
+        return [apply_delta(v, delta) for v in data]
+    return data
+
+
+def compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def decompress(data, name):
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"[{NODE_NAME}] {name} is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class WorkflowStore:
+    def __init__(self, root):
+        self.root = root
+        self.directory = os.path.join(root, WORKFLOW_STORE_DIR)
+        self._last = None           # (prompt, extra_pnginfo, ref) of the last put
+        self._lock = threading.Lock()
+
+    def _find(self, sha):
+        for suffix in (STORE_SUFFIX, ".json.zst", ".json.gz"):
+            path = os.path.join(self.directory, sha + suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _write(self, sha, body):
+        """Write body under its hash unless it is already stored; returns the file name."""
+        existing = self._find(sha)
+        if existing is not None:
+            return os.path.basename(existing)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, sha + STORE_SUFFIX)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(compress(body))
+            os.replace(tmp_path, path)
+            return os.path.basename(path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def put(self, prompt=None, extra_pnginfo=None):
+        """Store the shared part (once per distinct graph) and return the reference to embed."""
+        with self._lock:
+            last = self._last
+            if last is not None and last[0] is prompt and last[1] is extra_pnginfo:
+                return last[2]
+
+            shared, delta = split_metadata(prompt, extra_pnginfo)
+            body = canonical_json(shared)
+            sha = hashlib.sha256(body).hexdigest()
+            name = self._write(sha, body)
+            ref = {"sha256": sha, "file": f"{WORKFLOW_STORE_DIR}/{name}", "delta": delta}
+            self._last = (prompt, extra_pnginfo, ref)
+            return ref
+
+    def load(self, ref):
+        """(prompt, extra_pnginfo) for an embedded reference (dict or its JSON text)."""
+        if isinstance(ref, str):
+            ref = json.loads(ref)
+        path = self._find(ref["sha256"])
+        if path is None:
+            raise FileNotFoundError(f"[{NODE_NAME}] Workflow {ref['sha256']} not found in {self.directory}")
+        with open(path, "rb") as f:
+            shared = json.loads(decompress(f.read(), path))
+        restored = apply_delta(shared, ref.get("delta") or {})
+        return restored.get("prompt"), restored.get("extra_pnginfo")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def workflow_store(root):
+    """Shared WorkflowStore for an output root."""
+    root = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = WorkflowStore(root)
+        return store